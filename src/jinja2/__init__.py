@@ -24,9 +24,11 @@ from .loaders import ChoiceLoader as ChoiceLoader
 from .loaders import DictLoader as DictLoader
 from .loaders import FileSystemLoader as FileSystemLoader
 from .loaders import FunctionLoader as FunctionLoader
+from .loaders import HTTPLoader as HTTPLoader
 from .loaders import ModuleLoader as ModuleLoader
 from .loaders import PackageLoader as PackageLoader
 from .loaders import PrefixLoader as PrefixLoader
+from .loaders import SQLiteLoader as SQLiteLoader
 from .runtime import ChainableUndefined as ChainableUndefined
 from .runtime import DebugUndefined as DebugUndefined
 from .runtime import make_logging_undefined as make_logging_undefined
@@ -1,5 +1,8 @@
+import asyncio
 import inspect
+import threading
 import typing as t
+import weakref
 from functools import WRAPPER_ASSIGNMENTS
 from functools import wraps
 
@@ -97,3 +100,249 @@ async def auto_to_list(
     value: "t.AsyncIterable[V] | t.Iterable[V]",
 ) -> list["V"]:
     return [x async for x in auto_aiter(value)]
+
+
+def close_awaitables(values: t.Iterable[t.Any]) -> None:
+    """Close the coroutines and cancel the futures in ``values`` that
+    will not be awaited, such as when an error is raised before they
+    are passed to :func:`gather_awaitables`.
+    """
+    for value in values:
+        if inspect.iscoroutine(value):
+            value.close()
+        elif asyncio.isfuture(value):
+            value.cancel()
+
+
+async def gather_awaitables(*values: t.Any) -> list[t.Any]:
+    """Await the awaitable values concurrently and return all values in
+    order. If one fails, the others are cancelled. Without a running
+    asyncio event loop, such as with Trio, they are awaited one after
+    another.
+    """
+    indexes = [
+        i
+        for i, value in enumerate(values)
+        if type(value) not in _common_primitives and inspect.isawaitable(value)
+    ]
+    rv = list(values)
+
+    if not indexes:
+        return rv
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        for n, i in enumerate(indexes):
+            try:
+                rv[i] = await rv[i]
+            except BaseException:
+                close_awaitables([values[i] for i in indexes[n + 1 :]])
+                raise
+
+        return rv
+
+    tasks = [asyncio.ensure_future(values[i]) for i in indexes]
+
+    try:
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+
+        raise
+
+    for i, result in zip(indexes, results, strict=True):
+        rv[i] = result
+
+    return rv
+
+
+class _ThreadLoop(threading.local):
+    loop: asyncio.AbstractEventLoop | None = None
+    #: The tasks created during :func:`run_until_complete`.
+    tasks: "list[asyncio.Task[t.Any]] | None" = None
+
+
+_thread_loop = _ThreadLoop()
+
+
+def get_thread_loop() -> asyncio.AbstractEventLoop:
+    """Return the event loop that sync code in the current thread uses
+    to run async templates. It is created on first use and closed when
+    the thread ends, instead of creating and closing a loop for every
+    call like :func:`asyncio.run`.
+
+    :raise RuntimeError: An event loop is already running in this
+        thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        raise RuntimeError(
+            "Can't run an async template synchronously while an event loop"
+            " is running. Use the async methods instead."
+        )
+
+    loop = _thread_loop.loop
+
+    if loop is None or loop.is_closed():
+        loop = _thread_loop.loop = asyncio.new_event_loop()
+        loop.set_task_factory(_create_task)  # type: ignore[arg-type]
+        weakref.finalize(threading.current_thread(), _close_loop, loop)
+
+    return loop
+
+
+def _create_task(
+    loop: asyncio.AbstractEventLoop,
+    coro: "t.Coroutine[t.Any, t.Any, V]",
+    **kwargs: t.Any,
+) -> "asyncio.Task[V]":
+    task = asyncio.Task(coro, loop=loop, **kwargs)
+    tasks = _thread_loop.tasks
+
+    if tasks is not None:
+        tasks.append(task)
+
+    return task
+
+
+def _cancel_tasks(
+    loop: asyncio.AbstractEventLoop, tasks: "t.Collection[asyncio.Task[t.Any]]"
+) -> None:
+    """Cancel the tasks and wait until they finished, like
+    :func:`asyncio.run` does when the main coroutine returns.
+    """
+    if not tasks:
+        return
+
+    for task in tasks:
+        task.cancel()
+
+    loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+
+    for task in tasks:
+        if not task.cancelled() and task.exception() is not None:
+            loop.call_exception_handler(
+                {
+                    "message": "unhandled exception in a cancelled task",
+                    "exception": task.exception(),
+                    "task": task,
+                }
+            )
+
+
+def _close_loop(loop: asyncio.AbstractEventLoop) -> None:
+    """Finish the tasks, async generators, and executor of the loop of
+    a thread that ended, then close it.
+    """
+    try:
+        _cancel_tasks(loop, asyncio.all_tasks(loop))
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.run_until_complete(loop.shutdown_default_executor())
+    except RuntimeError:
+        # The thread that collected the ended thread is running a loop,
+        # so this one can't run. Close it anyway.
+        pass
+    finally:
+        loop.close()
+
+
+def run_until_complete(coro: "t.Coroutine[t.Any, t.Any, V]") -> V:
+    """Run a coroutine in the event loop of the current thread, see
+    :func:`get_thread_loop`. Tasks it starts and leaves running are
+    cancelled before this returns. Async generators it leaves open are
+    closed when the loop is, at the end of the thread.
+    """
+    try:
+        loop = get_thread_loop()
+    except RuntimeError:
+        coro.close()
+        raise
+
+    # Only tasks created during the call are cancelled, not tasks from
+    # before such as a paused ``iter_async``.
+    tasks: list[asyncio.Task[t.Any]] = []
+    _thread_loop.tasks = tasks
+
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        _thread_loop.tasks = None
+        _cancel_tasks(loop, [task for task in tasks if not task.done()])
+
+
+def iter_async(
+    agen: "t.AsyncGenerator[V, None]", batch_size: int = 1024, boundary: t.Any = None
+) -> "t.Iterator[V]":
+    """Iterate over an async generator from sync code, running it in the
+    event loop of the current thread, see :func:`get_thread_loop`. Items
+    are passed on in batches, as soon as the generator waits for
+    something, ``batch_size`` items were produced, or the ``boundary``
+    item is produced. The generator is paused while the caller is
+    processing a batch, so memory use doesn't grow with the total
+    output.
+
+    Switching between the loop and the caller for every item would be
+    an order of magnitude slower than running the generator to the end.
+    """
+    loop = get_thread_loop()
+    items: list[V] = []
+    waiter: asyncio.Future[None] = loop.create_future()
+    resume: asyncio.Future[None] | None = None
+    finished = False
+
+    def hand_over(waiter: "asyncio.Future[None]") -> None:
+        if not waiter.done():
+            waiter.set_result(None)
+
+    async def produce() -> None:
+        nonlocal resume, finished
+
+        append = items.append
+
+        try:
+            async for item in agen:
+                if not items:
+                    # Runs once the generator waits on the loop.
+                    loop.call_soon(hand_over, waiter)
+
+                append(item)
+
+                if item is boundary or len(items) >= batch_size:
+                    resume = loop.create_future()
+                    hand_over(waiter)
+                    await resume
+        finally:
+            finished = True
+            hand_over(waiter)
+
+    task = loop.create_task(produce())
+
+    try:
+        while True:
+            loop.run_until_complete(waiter)
+
+            if items:
+                batch = items[:]
+                items.clear()
+                yield from batch
+
+            if finished:
+                task.result()
+                break
+
+            waiter = loop.create_future()
+
+            if resume is not None:
+                resume.set_result(None)
+                resume = None
+    finally:
+        if not task.done():
+            task.cancel()
+            loop.run_until_complete(asyncio.gather(task, return_exceptions=True))
+
+        loop.run_until_complete(agen.aclose())
@@ -172,6 +172,12 @@ class BytecodeCache:
         """
         key = self.get_cache_key(name, filename)
         checksum = self.get_source_checksum(source)
+        constants_key = environment._constants_key()
+
+        # The values of constant globals are compiled into the code.
+        if constants_key:
+            checksum = sha1(f"{checksum}{constants_key[0]}".encode()).hexdigest()
+
         bucket = Bucket(environment, key, checksum)
         self.load_bytecode(bucket)
         return bucket
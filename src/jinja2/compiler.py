@@ -11,6 +11,8 @@ from markupsafe import escape
 from markupsafe import Markup
 
 from . import nodes
+from .defaults import DEFAULT_FILTERS  # type: ignore[attr-defined]
+from .defaults import DEFAULT_TESTS  # type: ignore[attr-defined]
 from .exceptions import TemplateAssertionError
 from .idtracking import Symbols
 from .idtracking import VAR_LOAD_ALIAS
@@ -18,6 +20,7 @@ from .idtracking import VAR_LOAD_PARAMETER
 from .idtracking import VAR_LOAD_RESOLVE
 from .idtracking import VAR_LOAD_UNDEFINED
 from .nodes import EvalContext
+from .optimizer import optimize_template
 from .optimizer import Optimizer
 from .utils import _PassArg
 from .utils import concat
@@ -41,6 +44,17 @@ operators = {
     "notin": "not in",
 }
 
+# Built-in filters and tests that never return an awaitable, so async
+# templates can call them without checking the result. This excludes
+# async variants and filters that can return an argument or an item of
+# one unchanged. Keyed by id as filters don't have to be hashable.
+_sync_builtins = {
+    id(func): func
+    for name, func in chain(DEFAULT_FILTERS.items(), DEFAULT_TESTS.items())
+    if not getattr(func, "jinja_async_variant", False)
+    and name not in {"attr", "d", "default", "last", "max", "min", "random"}
+}
+
 
 def optimizeconst(f: F) -> F:
     def new_func(
@@ -48,7 +62,15 @@ def optimizeconst(f: F) -> F:
     ) -> t.Any:
         # Only optimize if the frame is not volatile
         if self.optimizer is not None and not frame.eval_ctx.volatile:
-            new_node = self.optimizer.visit(node, frame.eval_ctx)
+            # The render functions are generated twice, fold each
+            # expression once as folding may call filters and tests.
+            key = (node, frame.eval_ctx.autoescape)
+            new_node = self._optimized.get(key)
+
+            if new_node is None:
+                new_node = self._optimized[key] = self.optimizer.visit(
+                    node, frame.eval_ctx
+                )
 
             if new_node != node:
                 return self.visit(new_node, frame)
@@ -224,7 +246,9 @@ class Frame:
     def inner(self, isolated: bool = False) -> "Frame":
         """Return an inner frame."""
         if isolated:
-            return Frame(self.eval_ctx, level=self.symbols.level + 1)
+            rv = Frame(self.eval_ctx, level=self.symbols.level + 1)
+            rv.buffer = self.buffer
+            return rv
         return Frame(self.eval_ctx, self)
 
     def soft(self) -> "te.Self":
@@ -288,6 +312,114 @@ class UndeclaredNameVisitor(NodeVisitor):
         """Stop visiting a blocks."""
 
 
+#: The special names that :class:`TemplateAnalysis` can check for
+#: undeclared access.
+_special_names = frozenset(("self", "super", "caller", "kwargs", "varargs", "loop"))
+
+
+class _NodeFacts(t.NamedTuple):
+    #: For each special name, whether it is loaded before it is assigned,
+    #: not looking into blocks.
+    names: dict[str, bool]
+    #: Whether a scoped block is nested in the node.
+    scoped_block: bool
+    #: The first assignment to ``loop`` nested in the node.
+    loop_assignment: nodes.Name | None
+
+
+_no_facts = _NodeFacts({}, False, None)
+
+
+class TemplateAnalysis:
+    """Collects the facts about a template that the code generator needs
+    in a single walk over the tree, instead of walking the subtree of each
+    statement again. The facts of each statement are stored with it, and
+    combined for the bodies the code generator asks about.
+    """
+
+    def __init__(self, node: nodes.Template) -> None:
+        #: Whether the template contains an extends tag.
+        self.has_extends = False
+        #: All blocks, in the order they appear in the template.
+        self.blocks: list[nodes.Block] = []
+        #: All imported names, in the order they appear in the template.
+        self.imports: list[nodes.ImportedName] = []
+        self._facts: dict[nodes.Node, _NodeFacts] = {}
+        self._analyze(node)
+
+    def _analyze(self, node: nodes.Node) -> _NodeFacts:
+        if isinstance(node, nodes.Name):
+            if node.name not in _special_names:
+                return _no_facts
+
+            return _NodeFacts(
+                {node.name: node.ctx == "load"},
+                False,
+                node if node.ctx == "store" and node.name == "loop" else None,
+            )
+
+        if isinstance(node, nodes.Extends):
+            self.has_extends = True
+        elif isinstance(node, nodes.Block):
+            self.blocks.append(node)
+        elif isinstance(node, nodes.ImportedName):
+            self.imports.append(node)
+
+        names: dict[str, bool] | None = None
+        scoped_block = False
+        loop_assignment = None
+
+        for child in node.iter_child_nodes():
+            facts = self._analyze(child)
+
+            if isinstance(child, nodes.Block):
+                scoped_block = scoped_block or child.scoped
+            elif facts.names:
+                if names is None:
+                    names = facts.names.copy()
+                else:
+                    for name, load in facts.names.items():
+                        names.setdefault(name, load)
+
+            scoped_block = scoped_block or facts.scoped_block
+
+            if loop_assignment is None:
+                loop_assignment = facts.loop_assignment
+
+        if names is None and not scoped_block and loop_assignment is None:
+            facts = _no_facts
+        else:
+            facts = _NodeFacts(names or {}, scoped_block, loop_assignment)
+
+        if isinstance(node, nodes.Stmt):
+            self._facts[node] = facts
+
+        return facts
+
+    def find_undeclared(
+        self, body: t.Iterable[nodes.Node], names: t.Iterable[str]
+    ) -> set[str]:
+        """Like :func:`find_undeclared`, for a body of statements in the
+        analyzed template and special names.
+        """
+        loads: dict[str, bool] = {}
+
+        for node in body:
+            if not isinstance(node, nodes.Block):
+                for name, load in self._facts[node].names.items():
+                    loads.setdefault(name, load)
+
+        return {name for name in names if loads.get(name)}
+
+    def has_scoped_block(self, node: nodes.Stmt) -> bool:
+        """Check if a scoped block is nested in the statement."""
+        return self._facts[node].scoped_block
+
+    def find_loop_assignment(self, node: nodes.Stmt) -> nodes.Name | None:
+        """Find the first assignment to ``loop`` nested in the statement."""
+        return self._facts[node].loop_assignment
+
+
 class CompilerExit(Exception):
     """Raised if the compiler encountered a situation where it just
     doesn't make sense to further process the code.  Any block that
@@ -318,6 +450,15 @@ class CodeGenerator(NodeVisitor):
         if optimized:
             self.optimizer = Optimizer(environment)
 
+        # the folded expressions by node and autoescape setting
+        self._optimized: dict[tuple[nodes.Node, t.Any], nodes.Node] = {}
+        self._output_bodies: dict[
+            tuple[nodes.Node, t.Any, bool], list[list[t.Any] | nodes.Expr]
+        ] = {}
+
+        # the truth values of the tests the optimizer found to be constant
+        self._const_tests: dict[nodes.Node, bool] = {}
+
         # aliases for imports
         self.import_aliases: dict[str, str] = {}
 
@@ -325,6 +466,13 @@ class CodeGenerator(NodeVisitor):
         # into the global python scope they are registered here
         self.blocks: dict[str, nodes.Block] = {}
 
+        # the names of templates loaded with a constant name, these are
+        # stored in the module so they can be prefetched
+        self.referenced_templates: dict[str, None] = {}
+
+        # the facts about the template collected before generating code
+        self.analysis: TemplateAnalysis | None = None
+
         # the number of extends statements so far
         self.extends_so_far = 0
 
@@ -626,7 +774,9 @@ class CodeGenerator(NodeVisitor):
                 skip_special_params.add(arg.name)
             args.append(frame.symbols.ref(arg.name))
 
-        undeclared = find_undeclared(node.body, ("caller", "kwargs", "varargs"))
+        undeclared = self.analysis.find_undeclared(  # type: ignore[union-attr]
+            node.body, ("caller", "kwargs", "varargs")
+        )
 
         if "caller" in undeclared:
             # In older Jinja versions there was a bug that allowed caller
@@ -716,10 +866,10 @@ class CodeGenerator(NodeVisitor):
         )
         return f"{{{items_kv}}}"
 
-    def write_commons(self) -> None:
+    def write_commons(self, buffered: bool = False) -> None:
         """Writes a common preamble that is used by root and block functions.
         Primarily this sets up common local helpers and enforces a generator
-        through a dead branch.
+        through a dead branch, unless the function is buffered.
         """
         self.writeline("resolve = context.resolve_or_missing")
         self.writeline("undefined = environment.undefined")
@@ -727,7 +877,8 @@ class CodeGenerator(NodeVisitor):
         # always use the standard Undefined class for the implicit else of
         # conditional expressions
         self.writeline("cond_expr_undefined = Undefined")
-        self.writeline("if 0: yield None")
+        if not buffered:
+            self.writeline("if 0: yield None")
 
     def push_parameter_definitions(self, frame: Frame) -> None:
         """Pushes all parameter targets from the given frame into a local
@@ -840,18 +991,21 @@ class CodeGenerator(NodeVisitor):
         # environment into a local name
         envenv = "" if self.defer_init else ", environment=environment"
 
-        # do we have an extends tag at all?  If not, we can save some
-        # overhead by just not processing any inheritance code.
-        have_extends = node.find(nodes.Extends) is not None
+        if self.optimizer is not None:
+            node, self._const_tests = optimize_template(
+                node, eval_ctx, self.environment._constant_globals()
+            )
+
+        analysis = self.analysis = TemplateAnalysis(node)
 
         # find all blocks
-        for block in node.find_all(nodes.Block):
+        for block in analysis.blocks:
             if block.name in self.blocks:
                 self.fail(f"block {block.name!r} defined twice", block.lineno)
             self.blocks[block.name] = block
 
         # find all imports and import them
-        for import_ in node.find_all(nodes.ImportedName):
+        for import_ in analysis.imports:
             if import_.importname not in self.import_aliases:
                 imp = import_.importname
                 self.import_aliases[imp] = alias = self.temporary_identifier()
@@ -864,16 +1018,61 @@ class CodeGenerator(NodeVisitor):
         # add the load name
         self.writeline(f"name = {self.name!r}")
 
+        extends_state = self.extends_so_far, self.has_known_extends
+        self.render_functions(node, eval_ctx, envenv)
+
+        # Synchronous templates get a second set of render functions that
+        # append to a list instead of yielding, used by ``render``.
+        if not self.environment.is_async:
+            self.extends_so_far, self.has_known_extends = extends_state
+            self.render_functions(node, eval_ctx, envenv, buffered=True)
+            self.writeline("root.buffered = buffered_root")
+
+            for name in self.blocks:
+                self.writeline(f"block_{name}.buffered = buffered_block_{name}")
+
+        blocks_kv_str = ", ".join(f"{x!r}: block_{x}" for x in self.blocks)
+        self.writeline(f"blocks = {{{blocks_kv_str}}}", extra=1)
+        if self.referenced_templates:
+            referenced = tuple(self.referenced_templates)
+            self.writeline(f"referenced_templates = {referenced!r}")
+        debug_kv_str = "&".join(f"{k}={v}" for k, v in self.debug_info)
+        self.writeline(f"debug_info = {debug_kv_str!r}")
+
+    def render_functions(
+        self,
+        node: nodes.Template,
+        eval_ctx: EvalContext,
+        envenv: str,
+        buffered: bool = False,
+    ) -> None:
+        """Write the root render function and the block render functions.
+        Buffered functions append to the ``buffer`` list passed to them
+        instead of yielding.
+        """
+        if buffered:
+            prefix = "buffered_"
+            params = "context, buffer"
+        else:
+            prefix = ""
+            params = "context"
+
+        analysis: TemplateAnalysis = self.analysis  # type: ignore[assignment]
+        have_extends = analysis.has_extends
+
         # generate the root render function.
         self.writeline(
-            f"{self.func('root')}(context, missing=missing{envenv}):", extra=1
+            f"{self.func(prefix + 'root')}({params}, missing=missing{envenv}):",
+            extra=1,
         )
         self.indent()
-        self.write_commons()
+        self.write_commons(buffered)
 
         # process the root
         frame = Frame(eval_ctx)
-        if "self" in find_undeclared(node.body, ("self",)):
+        if buffered:
+            frame.buffer = "buffer"
+        if "self" in analysis.find_undeclared(node.body, ("self",)):
             ref = frame.symbols.declare_parameter("self")
             self.writeline(f"{ref} = TemplateReference(context)")
         frame.symbols.analyze_node(node)
@@ -893,7 +1092,12 @@ class CodeGenerator(NodeVisitor):
                 self.indent()
                 self.writeline("if parent_template is not None:")
             self.indent()
-            if not self.environment.is_async:
+            if buffered:
+                self.writeline(
+                    "render_to_buffer(parent_template.root_render_func, context,"
+                    " buffer)"
+                )
+            elif not self.environment.is_async:
                 self.writeline("yield from parent_template.root_render_func(context)")
             else:
                 self.writeline("agen = parent_template.root_render_func(context)")
@@ -910,18 +1114,21 @@ class CodeGenerator(NodeVisitor):
         # at this point we now have the blocks collected and can visit them too.
         for name, block in self.blocks.items():
             self.writeline(
-                f"{self.func('block_' + name)}(context, missing=missing{envenv}):",
+                f"{self.func(f'{prefix}block_{name}')}({params},"
+                f" missing=missing{envenv}):",
                 block,
                 1,
             )
             self.indent()
-            self.write_commons()
+            self.write_commons(buffered)
             # It's important that we do not make this frame a child of the
             # toplevel template.  This would cause a variety of
             # interesting issues with identifier tracking.
             block_frame = Frame(eval_ctx)
             block_frame.block_frame = True
-            undeclared = find_undeclared(block.body, ("self", "super"))
+            if buffered:
+                block_frame.buffer = "buffer"
+            undeclared = analysis.find_undeclared(block.body, ("self", "super"))
             if "self" in undeclared:
                 ref = block_frame.symbols.declare_parameter("self")
                 self.writeline(f"{ref} = TemplateReference(context)")
@@ -937,11 +1144,6 @@ class CodeGenerator(NodeVisitor):
             self.leave_frame(block_frame, with_python_scope=True)
             self.outdent()
 
-        blocks_kv_str = ", ".join(f"{x!r}: block_{x}" for x in self.blocks)
-        self.writeline(f"blocks = {{{blocks_kv_str}}}", extra=1)
-        debug_kv_str = "&".join(f"{k}={v}" for k, v in self.debug_info)
-        self.writeline(f"debug_info = {debug_kv_str!r}")
-
     def visit_Block(self, node: nodes.Block, frame: Frame) -> None:
         """Call a block and register it for the template."""
         level = 0
@@ -973,6 +1175,12 @@ class CodeGenerator(NodeVisitor):
             self.writeline(
                 f"yield from context.blocks[{node.name!r}][0]({context})", node
             )
+        elif not self.environment.is_async:
+            self.writeline(
+                f"render_to_buffer(context.blocks[{node.name!r}][0], {context},"
+                f" {frame.buffer})",
+                node,
+            )
         else:
             self.writeline(f"gen = context.blocks[{node.name!r}][0]({context})")
             self.writeline("try:")
@@ -991,6 +1199,24 @@ class CodeGenerator(NodeVisitor):
 
         self.outdent(level)
 
+    def add_referenced_template(self, node: nodes.Expr) -> None:
+        """Remember the template names of an extends, include or import
+        if they are constant.
+        """
+        if isinstance(node, nodes.Const):
+            if isinstance(node.value, (tuple, list)):
+                values = list(node.value)
+            else:
+                values = [node.value]
+        elif isinstance(node, (nodes.Tuple, nodes.List)):
+            values = [x.value for x in node.items if isinstance(x, nodes.Const)]
+        else:
+            return
+
+        for value in values:
+            if isinstance(value, str):
+                self.referenced_templates[value] = None
+
     def visit_Extends(self, node: nodes.Extends, frame: Frame) -> None:
         """Calls the extender."""
         if not frame.toplevel:
@@ -1016,6 +1242,7 @@ class CodeGenerator(NodeVisitor):
             else:
                 self.outdent()
 
+        self.add_referenced_template(node.template)
         self.writeline("parent_template = environment.get_template(", node)
         self.visit(node.template, frame)
         self.write(f", {self.name!r})")
@@ -1048,6 +1275,7 @@ class CodeGenerator(NodeVisitor):
         elif isinstance(node.template, (nodes.Tuple, nodes.List)):
             func_name = "select_template"
 
+        self.add_referenced_template(node.template)
         self.writeline(f"template = environment.{func_name}(", node)
         self.visit(node.template, frame)
         self.write(f", {self.name!r})")
@@ -1065,7 +1293,17 @@ class CodeGenerator(NodeVisitor):
             self.simple_write("event", frame)
             self.outdent()
 
-        if node.with_context:
+        if (
+            node.with_context
+            and frame.buffer is not None
+            and not self.environment.is_async
+        ):
+            self.writeline(
+                "render_to_buffer(template.root_render_func,"
+                " template.new_context(context.get_all(), True,"
+                f" {self.dump_local_context(frame)}), {frame.buffer})"
+            )
+        elif node.with_context:
             self.writeline(
                 f"gen = template.root_render_func("
                 "template.new_context(context.get_all(), True,"
@@ -1085,6 +1323,10 @@ class CodeGenerator(NodeVisitor):
                 "._body_stream:"
             )
             loop_body()
+        elif frame.buffer is not None:
+            self.writeline(
+                f"{frame.buffer}.extend(template._get_default_module()._body_stream)"
+            )
         else:
             self.writeline("yield from template._get_default_module()._body_stream")
 
@@ -1094,6 +1336,7 @@ class CodeGenerator(NodeVisitor):
     def _import_common(
         self, node: nodes.Import | nodes.FromImport, frame: Frame
     ) -> None:
+        self.add_referenced_template(node.template)
         self.write(f"{self.choose_async('await ')}environment.get_template(")
         self.visit(node.template, frame)
         self.write(f", {self.name!r}).")
@@ -1181,11 +1424,11 @@ class CodeGenerator(NodeVisitor):
         # try to figure out if we have an extended loop.  An extended loop
         # is necessary if the loop is in recursive mode if the special loop
         # variable is accessed in the body if the body is a scoped block.
+        analysis: TemplateAnalysis = self.analysis  # type: ignore[assignment]
         extended_loop = (
             node.recursive
-            or "loop"
-            in find_undeclared(node.iter_child_nodes(only=("body",)), ("loop",))
-            or any(block.scoped for block in node.find_all(nodes.Block))
+            or "loop" in analysis.find_undeclared(node.body, ("loop",))
+            or analysis.has_scoped_block(node)
         )
 
         loop_ref = None
@@ -1235,12 +1478,13 @@ class CodeGenerator(NodeVisitor):
         if extended_loop:
             self.writeline(f"{loop_ref} = missing")
 
-        for name in node.find_all(nodes.Name):
-            if name.ctx == "store" and name.name == "loop":
-                self.fail(
-                    "Can't assign to special loop variable in for-loop target",
-                    name.lineno,
-                )
+        loop_assignment = analysis.find_loop_assignment(node)
+
+        if loop_assignment is not None:
+            self.fail(
+                "Can't assign to special loop variable in for-loop target",
+                loop_assignment.lineno,
+            )
 
         if node.else_:
             iteration_indicator = self.temporary_identifier()
@@ -1311,25 +1555,54 @@ class CodeGenerator(NodeVisitor):
         if self._assign_stack:
             self._assign_stack[-1].difference_update(loop_frame.symbols.stores)
 
+    def _const_test(self, node: nodes.Node, frame: Frame) -> bool | None:
+        """Return the truth value of a test if the optimizer can fold it
+        to a constant, otherwise ``None``.
+        """
+        if self.optimizer is None or frame.eval_ctx.volatile:
+            return None
+
+        value = self._const_tests.get(node)
+
+        if value is not None:
+            return value
+
+        try:
+            return bool(t.cast(nodes.Expr, node).as_const(frame.eval_ctx))
+        except nodes.Impossible:
+            return None
+
     def visit_If(self, node: nodes.If, frame: Frame) -> None:
         if_frame = frame.soft()
-        self.writeline("if ", node)
-        self.visit(node.test, if_frame)
-        self.write(":")
-        self.indent()
-        self.blockvisit(node.body, if_frame)
-        self.outdent()
-        for elif_ in node.elif_:
-            self.writeline("elif ", elif_)
-            self.visit(elif_.test, if_frame)
-            self.write(":")
-            self.indent()
-            self.blockvisit(elif_.body, if_frame)
-            self.outdent()
-        if node.else_:
-            self.writeline("else:")
+        # Branches with a constant false test are dropped, a constant
+        # true test becomes the else branch.
+        branches: list[tuple[nodes.If, nodes.Node | None, list[nodes.Node]]] = []
+
+        for branch in (node, *node.elif_):
+            value = self._const_test(branch.test, frame)
+
+            if value is None:
+                branches.append((branch, branch.test, branch.body))
+            elif value:
+                branches.append((branch, None, branch.body))
+                break
+        else:
+            if node.else_:
+                branches.append((node, None, node.else_))
+
+        if branches and branches[0][1] is None:
+            self.blockvisit(branches[0][2], if_frame)
+            return
+
+        for idx, (branch, test, body) in enumerate(branches):
+            if test is None:
+                self.writeline("else:")
+            else:
+                self.writeline("elif " if idx else "if ", branch)
+                self.visit(test, if_frame)
+                self.write(":")
             self.indent()
-            self.blockvisit(node.else_, if_frame)
+            self.blockvisit(body, if_frame)
             self.outdent()
 
     def visit_Macro(self, node: nodes.Macro, frame: Frame) -> None:
@@ -1494,18 +1767,21 @@ class CodeGenerator(NodeVisitor):
         if finalize.src is not None:
             self.write(")")
 
-    def visit_Output(self, node: nodes.Output, frame: Frame) -> None:
-        # If an extends is active, don't render outside a block.
-        if frame.require_output_check:
-            # A top-level extends is known to exist at compile time.
-            if self.has_known_extends:
-                return
+    def _output_body(
+        self, node: nodes.Output, frame: Frame, finalize: _FinalizeInfo
+    ) -> list[list[t.Any] | nodes.Expr]:
+        """Group the children of an ``Output`` node into lists of
+        constant data and nodes to evaluate at runtime. The result is
+        reused when the node is visited again for the buffered render
+        functions, as evaluating constants may call filters and tests.
+        """
+        key = (node, frame.eval_ctx.autoescape, frame.eval_ctx.volatile)
+        body = self._output_bodies.get(key)
 
-            self.writeline("if parent_template is None:")
-            self.indent()
+        if body is not None:
+            return body
 
-        finalize = self._make_finalize()
-        body: list[list[t.Any] | nodes.Expr] = []
+        body = self._output_bodies[key] = []
 
         # Evaluate constants at compile time if possible. Each item in
         # body will be either a list of static data or a node to be
@@ -1535,6 +1811,61 @@ class CodeGenerator(NodeVisitor):
             else:
                 body.append([const])
 
+        return body
+
+    def _gather_calls(
+        self, body: list[list[t.Any] | nodes.Expr], frame: Frame
+    ) -> dict[nodes.Expr, str]:
+        """With the ``compiler.concurrent_output`` policy in async mode,
+        start the calls in an ``Output`` node before awaiting them
+        together. Return the expression to output for each call.
+        """
+        if not (
+            self.environment.is_async
+            and self.environment.policies.get("compiler.concurrent_output")
+        ):
+            return {}
+
+        calls = [item for item in body if isinstance(item, nodes.Call)]
+
+        if len(calls) < 2:
+            return {}
+
+        # If a later call raises before they are gathered, the started
+        # calls are closed instead of never being awaited.
+        results = self.temporary_identifier()
+        self.writeline(f"{results} = []", calls[0])
+        self.writeline("try:")
+        self.indent()
+
+        for call in calls:
+            self.writeline(f"{results}.append(", call)
+            self.visit_Call(call, frame, await_result=False)
+            self.write(")")
+
+        self.outdent()
+        self.writeline("except BaseException:")
+        self.indent()
+        self.writeline(f"close_awaitables({results})")
+        self.writeline("raise")
+        self.outdent()
+        self.writeline(f"{results} = await gather_awaitables(*{results})")
+        return {call: f"{results}[{i}]" for i, call in enumerate(calls)}
+
+    def visit_Output(self, node: nodes.Output, frame: Frame) -> None:
+        # If an extends is active, don't render outside a block.
+        if frame.require_output_check:
+            # A top-level extends is known to exist at compile time.
+            if self.has_known_extends:
+                return
+
+            self.writeline("if parent_template is None:")
+            self.indent()
+
+        finalize = self._make_finalize()
+        body = self._output_body(node, frame, finalize)
+        gathered = self._gather_calls(body, frame)
+
         if frame.buffer is not None:
             if len(body) == 1:
                 self.writeline(f"{frame.buffer}.append(")
@@ -1560,7 +1891,12 @@ class CodeGenerator(NodeVisitor):
 
                 # A node to be evaluated at runtime.
                 self._output_child_pre(item, frame, finalize)
-                self.visit(item, frame)
+
+                if item in gathered:
+                    self.write(gathered[item])
+                else:
+                    self.visit(item, frame)
+
                 self._output_child_post(item, frame, finalize)
 
                 if frame.buffer is not None:
@@ -1744,15 +2080,10 @@ class CodeGenerator(NodeVisitor):
 
     @optimizeconst
     def visit_Getattr(self, node: nodes.Getattr, frame: Frame) -> None:
-        if self.environment.is_async:
-            self.write("(await auto_await(")
-
-        self.write("environment.getattr(")
-        self.visit(node.node, frame)
-        self.write(f", {node.attr!r})")
-
-        if self.environment.is_async:
-            self.write("))")
+        with self._auto_await():
+            self.write("environment.getattr(")
+            self.visit(node.node, frame)
+            self.write(f", {node.attr!r})")
 
     @optimizeconst
     def visit_Getitem(self, node: nodes.Getitem, frame: Frame) -> None:
@@ -1763,17 +2094,12 @@ class CodeGenerator(NodeVisitor):
             self.visit(node.arg, frame)
             self.write("]")
         else:
-            if self.environment.is_async:
-                self.write("(await auto_await(")
-
-            self.write("environment.getitem(")
-            self.visit(node.node, frame)
-            self.write(", ")
-            self.visit(node.arg, frame)
-            self.write(")")
-
-            if self.environment.is_async:
-                self.write("))")
+            with self._auto_await():
+                self.write("environment.getitem(")
+                self.visit(node.node, frame)
+                self.write(", ")
+                self.visit(node.arg, frame)
+                self.write(")")
 
     def visit_Slice(self, node: nodes.Slice, frame: Frame) -> None:
         if node.start is not None:
@@ -1785,18 +2111,31 @@ class CodeGenerator(NodeVisitor):
             self.write(":")
             self.visit(node.step, frame)
 
+    @contextmanager
+    def _auto_await(self, sync: bool = False) -> t.Iterator[None]:
+        """In async mode, await the value of the expression written in
+        the body if it is awaitable. This is inlined rather than calling
+        ``auto_await``, which would create a coroutine for every value.
+        Not needed if ``sync`` is true because the value is known not to
+        be awaitable.
+        """
+        if not self.environment.is_async or sync:
+            yield
+            return
+
+        self.write("(_aw if type(_aw := ")
+        yield
+        self.write(") in _common_primitives or not isawaitable(_aw) else await _aw)")
+
     @contextmanager
     def _filter_test_common(
         self, node: nodes.Filter | nodes.Test, frame: Frame, is_filter: bool
     ) -> t.Iterator[None]:
-        if self.environment.is_async:
-            self.write("(await auto_await(")
-
         if is_filter:
-            self.write(f"{self.filters[node.name]}(")
+            name = self.filters[node.name]
             func = self.environment.filters.get(node.name)
         else:
-            self.write(f"{self.tests[node.name]}(")
+            name = self.tests[node.name]
             func = self.environment.tests.get(node.name)
 
         # When inside an If or CondExpr frame, allow the filter to be
@@ -1814,18 +2153,18 @@ class CodeGenerator(NodeVisitor):
             _PassArg.from_obj(func)  # type: ignore
         )
 
-        if pass_arg is not None:
-            self.write(f"{pass_arg}, ")
+        with self._auto_await(_sync_builtins.get(id(func)) is func):
+            self.write(f"{name}(")
 
-        # Back to the visitor function to handle visiting the target of
-        # the filter or test.
-        yield
+            if pass_arg is not None:
+                self.write(f"{pass_arg}, ")
 
-        self.signature(node, frame)
-        self.write(")")
+            # Back to the visitor function to handle visiting the target
+            # of the filter or test.
+            yield
 
-        if self.environment.is_async:
-            self.write("))")
+            self.signature(node, frame)
+            self.write(")")
 
     @optimizeconst
     def visit_Filter(self, node: nodes.Filter, frame: Frame) -> None:
@@ -1851,6 +2190,14 @@ class CodeGenerator(NodeVisitor):
 
     @optimizeconst
     def visit_CondExpr(self, node: nodes.CondExpr, frame: Frame) -> None:
+        value = self._const_test(node.test, frame)
+
+        # Without an else branch the undefined value is created at
+        # runtime.
+        if value or (value is not None and node.expr2 is not None):
+            self.visit(node.expr1 if value else node.expr2, frame)  # type: ignore[arg-type]
+            return
+
         frame = frame.soft()
 
         def write_expr2() -> None:
@@ -1874,26 +2221,27 @@ class CodeGenerator(NodeVisitor):
 
     @optimizeconst
     def visit_Call(
-        self, node: nodes.Call, frame: Frame, forward_caller: bool = False
+        self,
+        node: nodes.Call,
+        frame: Frame,
+        forward_caller: bool = False,
+        await_result: bool = True,
     ) -> None:
-        if self.environment.is_async:
-            self.write("(await auto_await(")
-        if self.environment.sandboxed:
-            self.write("environment.call(context, ")
-        else:
-            self.write("context.call(")
-        self.visit(node.node, frame)
-        extra_kwargs = {"caller": "caller"} if forward_caller else None
-        loop_kwargs = {"_loop_vars": "_loop_vars"} if frame.loop_frame else {}
-        block_kwargs = {"_block_vars": "_block_vars"} if frame.block_frame else {}
-        if extra_kwargs:
-            extra_kwargs.update(loop_kwargs, **block_kwargs)
-        elif loop_kwargs or block_kwargs:
-            extra_kwargs = dict(loop_kwargs, **block_kwargs)
-        self.signature(node, frame, extra_kwargs)
-        self.write(")")
-        if self.environment.is_async:
-            self.write("))")
+        with self._auto_await(not await_result):
+            if self.environment.sandboxed:
+                self.write("environment.call(context, ")
+            else:
+                self.write("context.call(")
+            self.visit(node.node, frame)
+            extra_kwargs = {"caller": "caller"} if forward_caller else None
+            loop_kwargs = {"_loop_vars": "_loop_vars"} if frame.loop_frame else {}
+            block_kwargs = {"_block_vars": "_block_vars"} if frame.block_frame else {}
+            if extra_kwargs:
+                extra_kwargs.update(loop_kwargs, **block_kwargs)
+            elif loop_kwargs or block_kwargs:
+                extra_kwargs = dict(loop_kwargs, **block_kwargs)
+            self.signature(node, frame, extra_kwargs)
+            self.write(")")
 
     def visit_Keyword(self, node: nodes.Keyword, frame: Frame) -> None:
         self.write(node.key + "=")
@@ -1945,6 +2293,23 @@ class CodeGenerator(NodeVisitor):
     def visit_Break(self, node: nodes.Break, frame: Frame) -> None:
         self.writeline("break", node)
 
+    def visit_Flush(self, node: nodes.Flush, frame: Frame) -> None:
+        # Like output, a flush outside a block is ignored after extends.
+        if frame.require_output_check:
+            if self.has_known_extends:
+                return
+
+            self.writeline("if parent_template is None:")
+            self.indent()
+
+        if frame.buffer is None:
+            self.writeline("yield flush_marker", node)
+        else:
+            self.writeline(f"{frame.buffer}.append(flush_marker)", node)
+
+        if frame.require_output_check:
+            self.outdent()
+
     def visit_Scope(self, node: nodes.Scope, frame: Frame) -> None:
         scope_frame = frame.inner()
         scope_frame.symbols.analyze_node(node)
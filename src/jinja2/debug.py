@@ -111,7 +111,7 @@ def fake_traceback(  # type: ignore
     location = "template"
 
     if tb is not None:
-        function = tb.tb_frame.f_code.co_name
+        function = tb.tb_frame.f_code.co_name.removeprefix("buffered_")
 
         if function == "root":
             location = "top-level template code"
@@ -38,6 +38,9 @@ DEFAULT_NAMESPACE = {
 # default policies
 DEFAULT_POLICIES: dict[str, t.Any] = {
     "compiler.ascii_str": True,
+    "compiler.constant_globals": (),
+    "compiler.concurrent_output": False,
+    "bccache.from_string": False,
     "urlize.rel": "noopener",
     "urlize.target": None,
     "urlize.extra_schemes": None,
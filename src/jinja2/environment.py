@@ -2,20 +2,30 @@
 options.
 """
 
+import atexit
+import codecs
 import os
+import threading
 import typing
 import typing as t
 import weakref
 from collections import ChainMap
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import aclosing
 from functools import lru_cache
 from functools import partial
 from functools import reduce
+from hashlib import sha1
+from time import monotonic
 from types import CodeType
 
 from markupsafe import Markup
 
 from . import nodes
+from .async_utils import auto_to_list
+from .async_utils import iter_async
+from .async_utils import run_until_complete
 from .compiler import CodeGenerator
 from .compiler import generate
 from .defaults import BLOCK_END_STRING
@@ -43,11 +53,17 @@ from .lexer import get_lexer
 from .lexer import Lexer
 from .lexer import TokenStream
 from .nodes import EvalContext
+from .optimizer import _is_immutable
 from .parser import Parser
 from .runtime import Context
+from .runtime import flush_marker
 from .runtime import new_context
+from .runtime import render_to_buffer
 from .runtime import Undefined
+from .utils import _object_key
 from .utils import _PassArg
+from .utils import _stable_repr
+from .utils import _VersionedDict
 from .utils import concat
 from .utils import consume
 from .utils import import_string
@@ -64,6 +80,67 @@ if t.TYPE_CHECKING:
 
 _env_bound = t.TypeVar("_env_bound", bound="Environment")
 
+# compiled code shared by all environments with ``shared_code_cache``
+_code_cache: t.MutableMapping[tuple[t.Any, ...], CodeType] = LRUCache(400)  # type: ignore
+
+# loads templates in the background for ``prefetch_templates``
+_prefetch_executor: ThreadPoolExecutor | None = None
+_prefetch_lock = threading.Lock()
+
+
+def _get_prefetch_executor() -> ThreadPoolExecutor:
+    """Return the thread pool used to prefetch templates, creating it on
+    first use.
+    """
+    global _prefetch_executor
+
+    with _prefetch_lock:
+        if _prefetch_executor is None:
+            _prefetch_executor = ThreadPoolExecutor(
+                4, thread_name_prefix="jinja2-prefetch"
+            )
+            atexit.register(_shutdown_prefetch_executor)
+
+        return _prefetch_executor
+
+
+def _shutdown_prefetch_executor() -> None:
+    """Cancel the pending prefetches and shut down the thread pool. It is
+    created again if templates are prefetched afterwards.
+    """
+    global _prefetch_executor
+
+    with _prefetch_lock:
+        executor, _prefetch_executor = _prefetch_executor, None
+
+    if executor is not None:
+        atexit.unregister(_shutdown_prefetch_executor)
+        executor.shutdown(cancel_futures=True)
+
+
+class _Prefetches:
+    """The templates an environment is prefetching, and the lock for
+    starting and forgetting prefetches. Pending prefetches are not
+    pickled.
+    """
+
+    __slots__ = ("futures", "lock")
+
+    def __init__(self) -> None:
+        self.futures: dict[tuple[t.Any, ...], Future[None]] = {}
+        self.lock = threading.Lock()
+
+    def __reduce__(self) -> tuple[t.Any, ...]:
+        return _Prefetches, ()
+
+
+def _cancel_with(future: "Future[None]", task: "Future[t.Any]") -> None:
+    """Cancel a prefetch if its task was cancelled before it ran, for
+    example by shutting down the thread pool.
+    """
+    if task.cancelled():
+        future.cancel()
+
 
 # for direct template usage we have up to ten living environments
 @lru_cache(maxsize=10)
@@ -82,7 +159,7 @@ def get_spontaneous_environment(cls: type[_env_bound], *args: t.Any) -> _env_bou
 
 def create_cache(
     size: int,
-) -> t.MutableMapping[tuple["weakref.ref[BaseLoader]", str], "Template"] | None:
+) -> t.MutableMapping[tuple[t.Any, ...], "Template"] | None:
     """Return the cache class for the given size."""
     if size == 0:
         return None
@@ -94,8 +171,8 @@ def create_cache(
 
 
 def copy_cache(
-    cache: t.MutableMapping[tuple["weakref.ref[BaseLoader]", str], "Template"] | None,
-) -> t.MutableMapping[tuple["weakref.ref[BaseLoader]", str], "Template"] | None:
+    cache: t.MutableMapping[tuple[t.Any, ...], "Template"] | None,
+) -> t.MutableMapping[tuple[t.Any, ...], "Template"] | None:
     """Create an empty copy of the given cache."""
     if cache is None:
         return None
@@ -262,6 +339,48 @@ class Environment:
         `enable_async`
             If set to true this enables async template execution which
             allows using async functions and generators.
+
+        `shared_code_cache`
+            If set to ``True`` the code compiled from template source is
+            stored in a process wide cache and reused by every other
+            environment with this enabled and an identical configuration.
+            This avoids compiling the same templates again for each
+            environment in applications that create many similar
+            environments, for example one per tenant with different
+            globals or loaders.  The configuration is compared by the
+            lexer settings, extensions, filters, tests, policies and other
+            options that influence the generated code.  Extensions that
+            keep configuration of their own on the environment must
+            describe it in :meth:`~jinja2.ext.Extension.fingerprint`.
+            Defaults to ``False``.
+
+            .. versionadded:: 3.2
+
+        `string_cache_size`
+            The number of templates and expressions compiled from strings
+            by :meth:`from_string` and :meth:`compile_expression` to keep
+            in memory.  The cache is keyed by a checksum of the source, so
+            compiling the same string again only creates a new template
+            from the cached code.  If set to ``0`` strings are recompiled
+            all the time, if set to ``-1`` the cache will not be cleaned.
+            Defaults to ``50``.  See also the ``bccache.from_string``
+            :ref:`policy <policies>` to persist the compiled code with the
+            :attr:`bytecode_cache`.
+
+            .. versionadded:: 3.2
+
+        `prefetch_templates`
+            If set to ``True``, loading a template also starts loading the
+            templates it extends, includes and imports by a constant name
+            in a background thread, and so on for those templates.  When
+            the template is rendered, the referenced templates are then
+            often already loaded and compiled, which reduces the latency
+            of rendering a template with many dependencies for the first
+            time, especially if the loader is slow.  Prefetched templates
+            are stored in the template cache, so this has no effect if
+            ``cache_size`` is ``0``.  Defaults to ``False``.
+
+            .. versionadded:: 3.2
     """
 
     #: if this environment is sandboxed.  Modifying this variable won't make
@@ -316,6 +435,9 @@ class Environment:
         auto_reload: bool = True,
         bytecode_cache: t.Optional["BytecodeCache"] = None,
         enable_async: bool = False,
+        shared_code_cache: bool = False,
+        string_cache_size: int = 50,
+        prefetch_templates: bool = False,
     ):
         # !!Important notice!!
         #   The constructor accepts quite a few arguments that should be
@@ -349,23 +471,32 @@ class Environment:
         self.autoescape = autoescape
 
         # defaults
-        self.filters = DEFAULT_FILTERS.copy()
-        self.tests = DEFAULT_TESTS.copy()
+        self.filters: dict[str, t.Callable[..., t.Any]] = _VersionedDict(
+            DEFAULT_FILTERS
+        )
+        self.tests: dict[str, t.Callable[..., t.Any]] = _VersionedDict(DEFAULT_TESTS)
         self.globals = DEFAULT_NAMESPACE.copy()
 
         # set the loader provided
         self.loader = loader
         self.cache = create_cache(cache_size)
+        self.string_cache: t.MutableMapping[tuple[t.Any, ...], CodeType] | None = (
+            create_cache(string_cache_size)  # type: ignore[assignment]
+        )
         self.bytecode_cache = bytecode_cache
         self.auto_reload = auto_reload
+        self.prefetch_templates = prefetch_templates
+        self._prefetching = _Prefetches()
 
         # configurable policies
-        self.policies = DEFAULT_POLICIES.copy()
+        self.policies: dict[str, t.Any] = _VersionedDict(DEFAULT_POLICIES)
+        self._mappings_fingerprint: tuple[t.Any, ...] | None = None
 
         # load extensions
         self.extensions = load_extensions(self, extensions)
 
         self.is_async = enable_async
+        self.shared_code_cache = shared_code_cache
         _environment_config_check(self)
 
     def add_extension(self, extension: str | type["Extension"]) -> None:
@@ -408,6 +539,9 @@ class Environment:
         auto_reload: bool = missing,
         bytecode_cache: t.Optional["BytecodeCache"] = missing,
         enable_async: bool = missing,
+        shared_code_cache: bool = missing,
+        string_cache_size: int = missing,
+        prefetch_templates: bool = missing,
     ) -> "te.Self":
         """Create a new overlay environment that shares all the data with the
         current environment except for cache and the overridden attributes.
@@ -420,6 +554,10 @@ class Environment:
         copied over so modifications on the original environment may not shine
         through.
 
+        .. versionchanged:: 3.2
+            Added the ``shared_code_cache``, ``string_cache_size`` and
+            ``prefetch_templates`` parameters.
+
         .. versionchanged:: 3.1.5
             ``enable_async`` is applied correctly.
 
@@ -429,6 +567,7 @@ class Environment:
         """
         args = dict(locals())
         del args["self"], args["cache_size"], args["extensions"], args["enable_async"]
+        del args["string_cache_size"]
 
         rv = object.__new__(self.__class__)
         rv.__dict__.update(self.__dict__)
@@ -444,6 +583,13 @@ class Environment:
         else:
             rv.cache = copy_cache(self.cache)
 
+        if string_cache_size is not missing:
+            rv.string_cache = create_cache(string_cache_size)  # type: ignore
+        else:
+            rv.string_cache = copy_cache(self.string_cache)  # type: ignore
+
+        rv._prefetching = _Prefetches()
+
         rv.extensions = {}
         for key, value in self.extensions.items():
             rv.extensions[key] = value.bind(rv)
@@ -707,6 +853,128 @@ class Environment:
         """
         return compile(source, filename, "exec")
 
+    def _compile_fingerprint(self) -> tuple[t.Any, ...]:
+        """Return a hashable description of all the configuration that
+        influences the code generated for a template.  Environments with
+        equal fingerprints compile the same source to the same code.
+        Subclasses that add such configuration should extend this.
+
+        .. versionadded:: 3.2
+        """
+        return (
+            type(self),
+            self.code_generator_class,
+            self.block_start_string,
+            self.block_end_string,
+            self.variable_start_string,
+            self.variable_end_string,
+            self.comment_start_string,
+            self.comment_end_string,
+            self.line_statement_prefix,
+            self.line_comment_prefix,
+            self.trim_blocks,
+            self.lstrip_blocks,
+            self.newline_sequence,
+            self.keep_trailing_newline,
+            self.optimized,
+            _object_key(self.finalize),
+            _object_key(self.autoescape),
+            self.is_async,
+            getattr(self, "intercepted_binops", None),
+            getattr(self, "intercepted_unops", None),
+            tuple(
+                sorted(
+                    (k, type(v), v.fingerprint()) for k, v in self.extensions.items()
+                )
+            ),
+            self._mappings_key(),
+            self._constants_key(),
+        )
+
+    def _mappings_key(self) -> tuple[t.Any, ...]:
+        """Return the part of the fingerprint that describes the filters,
+        tests and policies. It is cached until one of the dicts is
+        changed or replaced, as long as they count their changes.
+        """
+        filters, tests, policies = self.filters, self.tests, self.policies
+        versions = (
+            getattr(filters, "version", None),
+            getattr(tests, "version", None),
+            getattr(policies, "version", None),
+        )
+        cached = getattr(self, "_mappings_fingerprint", None)
+
+        if (
+            cached is not None
+            and cached[0] is filters
+            and cached[1] is tests
+            and cached[2] is policies
+            and cached[3] == versions
+        ):
+            return cached[4]  # type: ignore[no-any-return]
+
+        rv = (
+            tuple(sorted((k, _object_key(v)) for k, v in filters.items())),
+            tuple(sorted((k, _object_key(v)) for k, v in tests.items())),
+            repr(sorted(policies.items())),
+        )
+
+        if None not in versions:
+            self._mappings_fingerprint = (filters, tests, policies, versions, rv)
+
+        return rv
+
+    def _constant_globals(self) -> dict[str, t.Any]:
+        """Return the globals named by the ``compiler.constant_globals``
+        policy that the optimizer compiles into templates. Only
+        immutable values of simple types can be compiled.
+        """
+        names = self.policies["compiler.constant_globals"]
+
+        if not names or not self.optimized:
+            return {}
+
+        return {
+            name: self.globals[name]
+            for name in names
+            if name in self.globals and _is_immutable(self.globals[name])
+        }
+
+    def _constants_key(self) -> tuple[str, ...]:
+        """Return the part of a cache key that describes the values of
+        the constant globals, empty if there are none.
+        """
+        constants = self._constant_globals()
+
+        if not constants:
+            return ()
+
+        return (repr(sorted(constants.items())),)
+
+    def _compile_shared(
+        self, source: str, name: str | None, filename: str | None, defer_init: bool
+    ) -> CodeType:
+        """Compile the template source, reusing code compiled by another
+        environment with the same configuration.
+        """
+        key = (
+            self._compile_fingerprint(),
+            name,
+            filename,
+            defer_init,
+            sha1(source.encode("utf-8")).hexdigest(),
+        )
+        code = _code_cache.get(key)
+
+        if code is None:
+            node = self._parse(source, name, filename)
+            _code_cache[key] = code = self._compile(
+                self._generate(node, name, filename, defer_init=defer_init),
+                "<template>" if filename is None else filename,
+            )
+
+        return code
+
     @typing.overload
     def compile(
         self,
@@ -752,6 +1020,12 @@ class Environment:
         causes the generated code to be able to import without the global
         environment variable to be set.
 
+        If the environment has ``shared_code_cache`` enabled, code compiled
+        from source is looked up in and stored to the shared code cache.
+
+        .. versionchanged:: 3.2
+           Use the shared code cache if enabled.
+
         .. versionadded:: 2.4
            `defer_init` parameter added.
         """
@@ -759,6 +1033,8 @@ class Environment:
         try:
             if isinstance(source, str):
                 source_hint = source
+                if self.shared_code_cache and not raw:
+                    return self._compile_shared(source, name, filename, defer_init)
                 source = self._parse(source, name, filename)
             source = self._generate(source, name, filename, defer_init=defer_init)
             if raw:
@@ -797,8 +1073,21 @@ class Environment:
         >>> env.compile_expression('var', undefined_to_none=False)()
         Undefined
 
+        .. versionchanged:: 3.2
+            The compiled code is cached, see ``string_cache_size``.
+
         .. versionadded:: 2.1
         """
+        code = self._compile_string(source, expression=True)
+        template = self.template_class.from_code(
+            self, code, self.make_globals(None), None
+        )
+        return TemplateExpression(template, undefined_to_none)
+
+    def _parse_expression(self, source: str) -> nodes.Template:
+        """Parse an expression for :meth:`compile_expression` into a
+        template that stores the result in the ``result`` variable.
+        """
         parser = Parser(self, source, state="variable")
         try:
             expr = parser.parse_expression()
@@ -811,8 +1100,51 @@ class Environment:
             self.handle_exception(source=source)
 
         body = [nodes.Assign(nodes.Name("result", "store"), expr, lineno=1)]
-        template = self.from_string(nodes.Template(body, lineno=1))
-        return TemplateExpression(template, undefined_to_none)
+        return nodes.Template(body, lineno=1)
+
+    def _compile_string(self, source: str, expression: bool = False) -> CodeType:
+        """Compile a template or expression source string for
+        :meth:`from_string` and :meth:`compile_expression`, using the
+        string cache and bytecode cache if they are enabled.
+        """
+        cache = self.string_cache
+
+        if cache is None:
+            if expression:
+                return self.compile(self._parse_expression(source))
+
+            return self.compile(source)
+
+        checksum = sha1(source.encode("utf-8")).hexdigest()
+        key = (self._compile_fingerprint(), expression, checksum)
+        code = cache.get(key)
+
+        if code is not None:
+            return code
+
+        bcc = self.bytecode_cache
+        bucket = None
+
+        if bcc is not None and self.policies["bccache.from_string"]:
+            # The cache can be shared with other environments, and other
+            # processes, that compile the source differently.
+            kind = "expression" if expression else "string"
+            config = sha1(_stable_repr(key[0]).encode("utf-8")).hexdigest()
+            bucket = bcc.get_bucket(self, f"<{kind} {checksum} {config}>", None, source)
+            code = bucket.code
+
+        if code is None:
+            if expression:
+                code = self.compile(self._parse_expression(source))
+            else:
+                code = self.compile(source)
+
+            if bucket is not None:
+                bucket.code = code
+                bcc.set_bucket(bucket)  # type: ignore[union-attr]
+
+        cache[key] = code
+        return code
 
     def compile_templates(
         self,
@@ -958,9 +1290,11 @@ class Environment:
     ) -> "Template":
         if self.loader is None:
             raise TypeError("no loader for this environment specified")
-        cache_key = (weakref.ref(self.loader), name)
+        cache_key = (weakref.ref(self.loader), name, *self._constants_key())
         if self.cache is not None:
             template = self.cache.get(cache_key)
+            if template is None and self._prefetching.futures:
+                template = self._wait_for_prefetch(cache_key)
             if template is not None and (
                 not self.auto_reload or template.is_up_to_date
             ):
@@ -975,8 +1309,112 @@ class Environment:
 
         if self.cache is not None:
             self.cache[cache_key] = template
+
+            if self.prefetch_templates:
+                self._prefetch_referenced(template)
         return template
 
+    def _prefetch_referenced(self, template: "Template") -> None:
+        """Start loading the templates referenced by the given template
+        in the background, unless they are loaded or being loaded already.
+        """
+        if self.loader is None or self.cache is None:
+            return
+
+        loader_ref = weakref.ref(self.loader)
+        constants_key = self._constants_key()
+        prefetches = self._prefetching
+
+        for name in template._referenced_templates:
+            name = self.join_path(name, template.name)  # type: ignore[arg-type]
+            cache_key = (loader_ref, name, *constants_key)
+
+            if cache_key in self.cache:
+                continue
+
+            future: Future[None] = Future()
+
+            with prefetches.lock:
+                current = prefetches.futures.get(cache_key)
+
+                if current is not None and not current.done():
+                    continue
+
+                prefetches.futures[cache_key] = future
+
+            future.add_done_callback(partial(self._prefetch_done, cache_key))
+
+            # Submit outside the lock, shutting down the pool cancels its
+            # tasks while holding its own lock, which runs the callback.
+            try:
+                task = _get_prefetch_executor().submit(
+                    self._run_prefetch, future, cache_key
+                )
+            except RuntimeError:
+                # The pool was shut down.
+                future.cancel()
+                continue
+
+            task.add_done_callback(partial(_cancel_with, future))
+
+    def _prefetch_done(
+        self, cache_key: tuple[t.Any, ...], future: Future[None]
+    ) -> None:
+        """Forget a finished or cancelled prefetch, unless it was replaced
+        by a newer one.
+        """
+        prefetches = self._prefetching
+
+        with prefetches.lock:
+            if prefetches.futures.get(cache_key) is future:
+                del prefetches.futures[cache_key]
+
+    def _run_prefetch(self, future: Future[None], cache_key: tuple[t.Any, ...]) -> None:
+        """Run a prefetch in the thread pool, unless it was cancelled."""
+        if not future.set_running_or_notify_cancel():
+            return
+
+        try:
+            self._prefetch_template(cache_key)
+        finally:
+            future.set_result(None)
+
+    def _prefetch_template(self, cache_key: tuple[t.Any, ...]) -> None:
+        """Load a template into the cache in a background thread. Errors
+        are ignored, they are raised when the template is loaded while
+        rendering.
+        """
+        loader = cache_key[0]()
+
+        if loader is None or self.cache is None:
+            return
+
+        try:
+            template = loader.load(self, cache_key[1], self.make_globals(None))
+        except Exception:
+            return
+
+        self.cache.setdefault(cache_key, template)
+        self._prefetch_referenced(template)
+
+    def _wait_for_prefetch(
+        self, cache_key: tuple[t.Any, ...]
+    ) -> t.Optional["Template"]:
+        """If the template is being prefetched, wait for it and return it
+        from the cache. If loading it didn't start yet, it is cancelled so
+        the caller can load it directly instead.
+        """
+        future = self._prefetching.futures.get(cache_key)
+
+        if future is None:
+            return None
+
+        if future.cancel():
+            return None
+
+        future.result()
+        return self.cache.get(cache_key)  # type: ignore[union-attr]
+
     @internalcode
     def get_template(
         self,
@@ -1102,10 +1540,20 @@ class Environment:
             cached, its globals are updated with any new items.
         :param template_class: Return an instance of this
             :class:`Template` class.
+
+        .. versionchanged:: 3.2
+            The code compiled from a source string is cached, see
+            ``string_cache_size``.
         """
         gs = self.make_globals(globals)
         cls = template_class or self.template_class
-        return cls.from_code(self, self.compile(source), gs, None)
+
+        if isinstance(source, str):
+            code = self._compile_string(source)
+        else:
+            code = self.compile(source)
+
+        return cls.from_code(self, code, gs, None)
 
     def make_globals(
         self, d: t.MutableMapping[str, t.Any] | None
@@ -1160,6 +1608,7 @@ class Template:
     _module: t.Optional["TemplateModule"]
     _debug_info: str
     _uptodate: t.Callable[[], bool] | None
+    _referenced_templates: tuple[str, ...]
 
     def __new__(
         cls,
@@ -1262,6 +1711,7 @@ class Template:
         # debug and loader helpers
         t._debug_info = namespace["debug_info"]
         t._uptodate = None
+        t._referenced_templates = namespace.get("referenced_templates", ())
 
         # store the reference
         namespace["environment"] = environment
@@ -1280,14 +1730,14 @@ class Template:
         This will return the rendered template as a string.
         """
         if self.environment.is_async:
-            import asyncio
-
-            return asyncio.run(self.render_async(*args, **kwargs))
+            return run_until_complete(self.render_async(*args, **kwargs))
 
         ctx = self.new_context(dict(*args, **kwargs))
 
         try:
-            return self.environment.concat(self.root_render_func(ctx))  # type: ignore
+            buffer: list[str] = []
+            render_to_buffer(self.root_render_func, ctx, buffer)
+            return self.environment.concat(buffer)  # type: ignore
         except Exception:
             self.environment.handle_exception()
 
@@ -1314,12 +1764,114 @@ class Template:
         except Exception:
             return self.environment.handle_exception()
 
+    def render_into(
+        self,
+        sink: t.Callable[[t.Any], t.Any] | t.IO[t.Any] | bytearray,
+        /,
+        *args: t.Any,
+        buffer_size: int = 0,
+        output_encoding: str | None = None,
+        output_errors: str = "strict",
+        **kwargs: t.Any,
+    ) -> None:
+        """Render the template and pass the output to ``sink`` piece by
+        piece instead of joining it into a string. Accepts the same
+        template variables as :meth:`render`.
+
+        .. code-block:: python
+
+            with open("page.html", "w") as f:
+                template.render_into(f, buffer_size=8192, user=user)
+
+        :param sink: A function that is called with each string, or an
+            object with a ``write`` method such as a file or
+            :class:`io.StringIO`. Its ``writelines`` method is used too,
+            if it has one. With ``output_encoding``, it is passed bytes
+            instead, and can be a :class:`bytearray` too.
+        :param buffer_size: Join the output until it is at least this
+            many characters long before passing it to ``sink``. By
+            default every piece is passed as soon as it is rendered.
+        :param output_encoding: Encode the output with this encoding
+            before passing it to ``sink``. Use a ``buffer_size`` with it,
+            encoding each piece on its own is slow.
+        :param output_errors: How to handle characters the encoding can't
+            represent, see :meth:`str.encode`.
+
+        ``buffer_size``, ``output_encoding`` and ``output_errors`` are
+        not passed to the template.
+
+        .. versionadded:: 3.2
+        """
+        if self.environment.is_async:
+            return run_until_complete(
+                self.render_into_async(
+                    sink,
+                    *args,
+                    buffer_size=buffer_size,
+                    output_encoding=output_encoding,
+                    output_errors=output_errors,
+                    **kwargs,
+                )
+            )
+
+        ctx = self.new_context(dict(*args, **kwargs))
+        writer = _Writer(sink, buffer_size, output_encoding, output_errors)
+
+        try:
+            render_to_buffer(self.root_render_func, ctx, writer)  # type: ignore[arg-type]
+        except Exception:
+            self.environment.handle_exception()
+
+        writer.close()
+
+    async def render_into_async(
+        self,
+        sink: t.Callable[[t.Any], t.Any] | t.IO[t.Any] | bytearray,
+        /,
+        *args: t.Any,
+        buffer_size: int = 0,
+        output_encoding: str | None = None,
+        output_errors: str = "strict",
+        **kwargs: t.Any,
+    ) -> None:
+        """An async version of :meth:`render_into`. ``sink`` is called
+        the same way, it is not awaited.
+
+        .. versionadded:: 3.2
+        """
+        if not self.environment.is_async:
+            raise RuntimeError(
+                "The environment was not created with async mode enabled."
+            )
+
+        ctx = self.new_context(dict(*args, **kwargs))
+        writer = _Writer(sink, buffer_size, output_encoding, output_errors)
+
+        try:
+            agen: t.AsyncGenerator[str, None] = self.root_render_func(ctx)  # type: ignore[assignment]
+
+            async with aclosing(agen):
+                async for event in agen:
+                    writer.append(event)
+        except Exception:
+            self.environment.handle_exception()
+
+        writer.close()
+
     def stream(self, *args: t.Any, **kwargs: t.Any) -> "TemplateStream":
         """Works exactly like :meth:`generate` but returns a
         :class:`TemplateStream`.
         """
         return TemplateStream(self.generate(*args, **kwargs))
 
+    def stream_async(self, *args: t.Any, **kwargs: t.Any) -> "AsyncTemplateStream":
+        """Works exactly like :meth:`generate_async` but returns an
+        :class:`AsyncTemplateStream`.
+
+        .. versionadded:: 3.2
+        """
+        return AsyncTemplateStream(self.generate_async(*args, **kwargs))
+
     def generate(self, *args: t.Any, **kwargs: t.Any) -> t.Iterator[str]:
         """For very large templates it can be useful to not render the whole
         template at once but evaluate each statement after another and yield
@@ -1329,12 +1881,9 @@ class Template:
         It accepts the same arguments as :meth:`render`.
         """
         if self.environment.is_async:
-            import asyncio
-
-            async def to_list() -> list[str]:
-                return [x async for x in self.generate_async(*args, **kwargs)]
-
-            yield from asyncio.run(to_list())
+            yield from iter_async(
+                self.generate_async(*args, **kwargs), boundary=flush_marker
+            )
             return
 
         ctx = self.new_context(dict(*args, **kwargs))
@@ -1528,7 +2077,8 @@ class TemplateModule:
                     " API you are using."
                 )
 
-            body_stream = list(template.root_render_func(context))
+            body_stream = []
+            render_to_buffer(template.root_render_func, context, body_stream)
 
         self._body_stream = body_stream
         self.__dict__.update(context.get_exported())
@@ -1560,13 +2110,264 @@ class TemplateExpression:
 
     def __call__(self, *args: t.Any, **kwargs: t.Any) -> t.Any | None:
         context = self._template.new_context(dict(*args, **kwargs))
-        consume(self._template.root_render_func(context))
+
+        if self._template.environment.is_async:
+            run_until_complete(auto_to_list(self._template.root_render_func(context)))
+        else:
+            consume(self._template.root_render_func(context))
+
         rv = context.vars["result"]
         if self._undefined_to_none and isinstance(rv, Undefined):
             rv = None
         return rv
 
 
+class _Writer:
+    """Takes the place of the output list of the buffered render
+    functions and passes the output to a sink instead. With a buffer
+    size, pieces are joined until they are at least that long. With an
+    encoding, the sink is passed bytes.
+    """
+
+    __slots__ = (
+        "append",
+        "extend",
+        "_write",
+        "_sink_write",
+        "_encoder",
+        "_buffer",
+        "_size",
+        "_length",
+    )
+    append: t.Callable[[t.Any], t.Any]
+    extend: t.Callable[[t.Iterable[str]], t.Any]
+    _write: t.Callable[[t.Any], t.Any]
+    _sink_write: t.Callable[[t.Any], t.Any]
+
+    def __init__(
+        self,
+        sink: t.Callable[[t.Any], t.Any] | t.IO[t.Any] | bytearray,
+        size: int,
+        encoding: str | None = None,
+        errors: str = "strict",
+    ) -> None:
+        write: t.Callable[[t.Any], t.Any]
+
+        if isinstance(sink, bytearray):
+            write = sink.extend
+        else:
+            write = getattr(sink, "write", sink)  # type: ignore[arg-type]
+
+        self._sink_write = write
+        self._encoder: codecs.IncrementalEncoder | None = None
+
+        if encoding is not None:
+            self._encoder = codecs.getincrementalencoder(encoding)(errors)
+            write = partial(_write_encoded, write, self._encoder.encode)
+
+        self._write = write
+        self._buffer: list[str] = []
+        self._size = size
+        self._length = 0
+
+        if size > 0:
+            self.append = self._append_buffered
+            self.extend = self._extend_buffered
+        elif self._encoder is None:
+            self.append = write
+            self.extend = getattr(sink, "writelines", self._extend)
+        else:
+            self.append = write
+            self.extend = self._extend
+
+    def _extend(self, items: t.Iterable[str]) -> None:
+        write = self._write
+
+        for item in items:
+            write(item)
+
+    def _append_buffered(self, item: str) -> None:
+        if item is flush_marker:
+            self.flush()
+            return
+
+        self._buffer.append(item)
+        self._length += len(item)
+
+        if self._length >= self._size:
+            self.flush()
+
+    def _extend_buffered(self, items: t.Iterable[str]) -> None:
+        # Included templates and render functions without a buffered
+        # variant pass their output here, flush markers included.
+        for item in items:
+            if item is flush_marker:
+                self.flush()
+                continue
+
+            self._buffer.append(item)
+            self._length += len(item)
+
+        if self._length >= self._size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buffer:
+            self._write(concat(self._buffer))
+            self._buffer.clear()
+            self._length = 0
+
+    def close(self) -> None:
+        """Write the rest of the output."""
+        self.flush()
+
+        if self._encoder is not None:
+            end = self._encoder.encode("", True)
+
+            if end:
+                self._sink_write(end)
+
+
+def _write_encoded(
+    write: t.Callable[[bytes], t.Any], encode: t.Callable[[str], bytes], s: str
+) -> None:
+    data = encode(s)
+
+    if data:
+        write(data)
+
+
+class _ItemJoiner:
+    """Joins rendered items into chunks of ``size`` non-empty items or,
+    with ``chars``, ``size`` characters. A chunk also ends once
+    ``max_latency`` seconds passed since its first item, or at a flush
+    marker. Shared by the sync and async stream buffering.
+    """
+
+    __slots__ = ("_buf", "push")
+
+    def __init__(self, size: int, chars: bool, max_latency: float | None) -> None:
+        self._buf: list[str] = []
+        gen = self._join(self._buf, size, chars, max_latency)
+        next(gen)
+        #: Add an item and return a chunk if one is complete.
+        self.push: t.Callable[[str], str | None] = gen.send
+
+    @staticmethod
+    def _join(
+        buf: list[str], size: int, chars: bool, max_latency: float | None
+    ) -> t.Generator[str | None, str, None]:
+        # The state is kept in locals of a generator, which is faster
+        # than attributes for a call per rendered item.
+        push = buf.append
+        c_size = 0
+        started = 0.0
+        chunk = None
+
+        while True:
+            c = yield chunk
+            chunk = None
+
+            if c is flush_marker:
+                if c_size:
+                    chunk = concat(buf)
+                    del buf[:]
+                    c_size = 0
+
+                continue
+
+            if max_latency is not None and not buf:
+                started = monotonic()
+
+            push(c)
+
+            if chars:
+                c_size += len(c)
+            elif c:
+                c_size += 1
+
+            if c_size >= size or (
+                max_latency is not None
+                and c_size
+                and monotonic() - started >= max_latency
+            ):
+                chunk = concat(buf)
+                del buf[:]
+                c_size = 0
+
+    def finish(self) -> str | None:
+        """Return the remaining items as a chunk after the last item,
+        unless they are all empty.
+        """
+        rv = concat(self._buf)
+        del self._buf[:]
+        return rv or None
+
+
+def _join_items(
+    items: t.Iterable[str],
+    size: int,
+    chars: bool = False,
+    max_latency: float | None = None,
+) -> t.Iterator[str]:
+    """Join items with an :class:`_ItemJoiner`."""
+    joiner = _ItemJoiner(size, chars, max_latency)
+    push = joiner.push
+
+    for item in items:
+        chunk = push(item)
+
+        if chunk is not None:
+            yield chunk
+
+    chunk = joiner.finish()
+
+    if chunk is not None:
+        yield chunk
+
+
+async def _join_items_async(
+    items: t.AsyncIterator[str],
+    size: int,
+    chars: bool = False,
+    max_latency: float | None = None,
+) -> t.AsyncGenerator[str, None]:
+    """An async version of :func:`_join_items`."""
+    joiner = _ItemJoiner(size, chars, max_latency)
+    push = joiner.push
+
+    async for item in items:
+        chunk = push(item)
+
+        if chunk is not None:
+            yield chunk
+
+    chunk = joiner.finish()
+
+    if chunk is not None:
+        yield chunk
+
+
+def _encode_items(
+    items: t.Iterable[str], encoding: str, errors: str | None
+) -> t.Iterator[bytes]:
+    """Encode each item with an incremental encoder, which keeps state
+    such as a byte order mark between items.
+    """
+    encode = codecs.getincrementalencoder(encoding)(errors or "strict").encode
+
+    for item in items:
+        data = encode(item)
+
+        if data:
+            yield data
+
+    tail = encode("", True)
+
+    if tail:
+        yield tail
+
+
 class TemplateStream:
     """A template stream works pretty much like an ordinary python generator
     but it can buffer multiple items to reduce the number of total iterations.
@@ -1595,6 +2396,11 @@ class TemplateStream:
         Example usage::
 
             Template('Hello {{ name }}!').stream(name='foo').dump('hello.html')
+
+        .. versionchanged:: 3.2
+            With an `encoding`, the output is encoded with an incremental
+            encoder. Unless buffering is enabled, it is joined into chunks
+            of at least 8192 characters first.
         """
         close = False
 
@@ -1609,7 +2415,13 @@ class TemplateStream:
 
         try:
             if encoding is not None:
-                iterable = (x.encode(encoding, errors) for x in self)  # type: ignore
+                items: t.Iterable[str] = self
+
+                # Keep the chunks and flush points of enabled buffering.
+                if not self.buffered:
+                    items = _join_items(self, 8192, chars=True)
+
+                iterable = _encode_items(items, encoding, errors)
             else:
                 iterable = self  # type: ignore
 
@@ -1627,32 +2439,30 @@ class TemplateStream:
         self._next = partial(next, self._gen)
         self.buffered = False
 
-    def _buffered_generator(self, size: int) -> t.Iterator[str]:
-        buf: list[str] = []
-        c_size = 0
-        push = buf.append
+    def enable_buffering(
+        self, size: int = 5, chars: bool = False, max_latency: float | None = None
+    ) -> None:
+        """Enable buffering.  Buffer `size` items before yielding them.
 
-        while True:
-            try:
-                while c_size < size:
-                    c = next(self._gen)
-                    push(c)
-                    if c:
-                        c_size += 1
-            except StopIteration:
-                if not c_size:
-                    return
-            yield concat(buf)
-            del buf[:]
-            c_size = 0
-
-    def enable_buffering(self, size: int = 5) -> None:
-        """Enable buffering.  Buffer `size` items before yielding them."""
+        :param size: The number of items to buffer.
+        :param chars: Buffer items until they are at least `size`
+            characters long instead, for predictable chunk sizes.
+        :param max_latency: Yield the buffered items once this many
+            seconds passed since the first of them was rendered, even if
+            there are fewer than `size`. Checked whenever an item is
+            rendered.
+
+        The buffered items are also yielded at a ``{% flush %}`` tag,
+        see :class:`~jinja2.ext.FlushExtension`.
+
+        .. versionchanged:: 3.2
+            Added the `chars` and `max_latency` parameters.
+        """
         if size <= 1:
             raise ValueError("buffer size too small")
 
         self.buffered = True
-        self._next = partial(next, self._buffered_generator(size))
+        self._next = partial(next, _join_items(self._gen, size, chars, max_latency))
 
     def __iter__(self) -> "TemplateStream":
         return self
@@ -1661,6 +2471,96 @@ class TemplateStream:
         return self._next()  # type: ignore
 
 
+class AsyncTemplateStream:
+    """An async version of :class:`TemplateStream`, returned by
+    :meth:`Template.stream_async`. Iterate over it with ``async for``.
+
+    .. versionadded:: 3.2
+    """
+
+    def __init__(self, gen: t.AsyncGenerator[str, None]) -> None:
+        self._gen = gen
+        self.disable_buffering()
+
+    async def dump(
+        self,
+        writer: t.Any,
+        encoding: str | None = "utf-8",
+        errors: str | None = "strict",
+    ) -> None:
+        """Write the complete stream to ``writer``, such as an
+        :class:`asyncio.StreamWriter`. If it has a ``drain`` method, it
+        is awaited after each write, so rendering waits while a slow
+        client catches up instead of the output growing in memory.
+
+        Unless buffering is enabled, the output is joined into chunks of
+        at least 8192 characters before each write. The chunks are
+        encoded with an incremental encoder, unless ``encoding`` is
+        ``None``.
+
+        Example usage::
+
+            await template.stream_async(name="foo").dump(writer)
+        """
+        write = writer.write
+        drain = getattr(writer, "drain", None)
+        encode = None
+
+        if encoding is not None:
+            encode = codecs.getincrementalencoder(encoding)(errors or "strict").encode
+
+        if not self.buffered:
+            self.enable_buffering(8192, chars=True)
+
+        try:
+            async for chunk in self:
+                write(chunk if encode is None else encode(chunk))
+
+                if drain is not None:
+                    await drain()
+        finally:
+            await self.aclose()
+
+        if encode is not None:
+            tail = encode("", True)
+
+            if tail:
+                write(tail)
+
+                if drain is not None:
+                    await drain()
+
+    def disable_buffering(self) -> None:
+        """Disable the output buffering."""
+        self._buffered_gen: t.AsyncGenerator[str, None] | None = None
+        self._next = self._gen.__anext__
+        self.buffered = False
+
+    def enable_buffering(
+        self, size: int = 5, chars: bool = False, max_latency: float | None = None
+    ) -> None:
+        """Enable buffering, see :meth:`TemplateStream.enable_buffering`."""
+        if size <= 1:
+            raise ValueError("buffer size too small")
+
+        self.buffered = True
+        self._buffered_gen = _join_items_async(self._gen, size, chars, max_latency)
+        self._next = self._buffered_gen.__anext__
+
+    async def aclose(self) -> None:
+        """Stop rendering the template."""
+        if self._buffered_gen is not None:
+            await self._buffered_gen.aclose()
+
+        await self._gen.aclose()
+
+    def __aiter__(self) -> "AsyncTemplateStream":
+        return self
+
+    async def __anext__(self) -> str:
+        return await self._next()
+
+
 # hook in default template class.  if anyone reads this comment: ignore that
 # it's possible to use custom templates ;-)
 Environment.template_class = Template
@@ -14,6 +14,7 @@ from .exceptions import TemplateSyntaxError
 from .runtime import concat  # type: ignore
 from .runtime import Context
 from .runtime import Undefined
+from .utils import _object_key
 from .utils import import_string
 from .utils import pass_context
 
@@ -96,6 +97,26 @@ class Extension:
         rv.environment = environment
         return rv
 
+    def fingerprint(self) -> t.Hashable:
+        """Return a hashable description of the configuration of this
+        extension that influences the code generated for templates.
+        Environments with a ``shared_code_cache`` only reuse each other's
+        code if the fingerprints of their extensions are equal.
+
+        The default uses the attributes set on the extension other than
+        ``environment``. Extensions that store configuration that changes
+        the generated code on the environment should add it here.
+
+        .. versionadded:: 3.2
+        """
+        return tuple(
+            sorted(
+                (key, _object_key(value))
+                for key, value in self.__dict__.items()
+                if key != "environment"
+            )
+        )
+
     def preprocess(
         self, source: str, name: str | None, filename: str | None = None
     ) -> str:
@@ -265,6 +286,9 @@ class InternationalizationExtension(Extension):
             newstyle_gettext=False,
         )
 
+    def fingerprint(self) -> t.Hashable:
+        return (super().fingerprint(), self.environment.newstyle_gettext)  # type: ignore
+
     def _install(
         self, translations: "_SupportedTranslations", newstyle: bool | None = None
     ) -> None:
@@ -592,6 +616,28 @@ class LoopControlExtension(Extension):
         return nodes.Continue(lineno=token.lineno)
 
 
+class FlushExtension(Extension):
+    """A ``{% flush %}`` tag that marks where the output rendered so far
+    should be sent to the client, such as after the ``<head>`` of a
+    page.
+
+    :meth:`~jinja2.Template.generate` yields
+    :data:`~jinja2.runtime.flush_marker`, an empty string, at the tag.
+    A buffered :class:`~jinja2.environment.TemplateStream` and
+    :meth:`~jinja2.Template.render_into` with a ``buffer_size`` pass on
+    the output they buffered. The tag does nothing inside macros, call
+    blocks, filter sections, and block assignments, as their output is
+    rendered to a string first.
+
+    .. versionadded:: 3.2
+    """
+
+    tags = {"flush"}
+
+    def parse(self, parser: "Parser") -> nodes.Flush:
+        return nodes.Flush(lineno=next(parser.stream).lineno)
+
+
 class DebugExtension(Extension):
     """A ``{% debug %}`` tag that dumps the available variables,
     filters, and tests.
@@ -842,3 +888,4 @@ i18n = InternationalizationExtension
 do = ExprStmtExtension
 loopcontrols = LoopControlExtension
 debug = DebugExtension
+flush = FlushExtension
@@ -0,0 +1,316 @@
+"""Keep the syntax tree of a template up to date while its source is
+edited, for editors and live previews that parse on every change.
+"""
+
+import typing as t
+from bisect import bisect_left
+
+from . import nodes
+from .exceptions import TemplateSyntaxError
+from .ext import Extension
+from .lexer import Token
+from .lexer import TokenStream
+from .parser import Parser
+
+if t.TYPE_CHECKING:
+    from .environment import Environment
+
+
+class _Segment(t.NamedTuple):
+    """The nodes of the output and the top-level statement ending at
+    ``end`` in the source. The last segment ends at the end of the
+    source and has no statement.
+    """
+
+    end: int
+    nodes: list[nodes.Node]
+
+
+class _SegmentStream(TokenStream):
+    """A token stream that ends after the current token once ``stop``
+    is set.
+    """
+
+    stop = False
+
+    def __next__(self) -> Token:
+        if self.stop:
+            rv = self.current
+            self.close()
+            return rv
+
+        return super().__next__()
+
+
+class _SegmentParser(Parser):
+    """Parses the top-level statements of a template from a position
+    after a tag and records where each of them ends. Parsing stops after
+    a statement ending at one of the ``resync`` positions.
+    """
+
+    def __init__(
+        self, incremental: "IncrementalParser", pos: int, resync: dict[int, int]
+    ) -> None:
+        super().__init__(
+            incremental.environment, "", incremental.name, incremental.filename
+        )
+        self._last_identifier = incremental._last_identifier
+        self._depth = 0
+        self._resync = resync
+        self._block_ends: dict[int, tuple[Token, int]] = {}
+        #: The last node and the end position of each top-level statement.
+        self.statement_ends: list[tuple[nodes.Node, int]] = []
+        #: The index of the old segment parsing stopped at, if any.
+        self.resync_index: int | None = None
+
+        lexer = self.environment.lexer
+        source = incremental.source
+        source_length = len(source)
+
+        if not lexer.keep_trailing_newline and source[-1:] == "\n":
+            source_length -= 1
+
+        cursor = [pos]
+        lineno = source.count("\n", 0, pos) + 1
+        raw = lexer._tokeniter(
+            source,
+            source_length,
+            self.name,
+            self.filename,
+            ["root"],
+            pos,
+            lineno,
+            cursor,
+        )
+
+        def track(tokens: t.Iterator[Token]) -> t.Iterator[Token]:
+            for token in tokens:
+                if token.type == "block_end":
+                    self._block_ends[id(token)] = (token, cursor[0])
+
+                yield token
+
+        self.stream = _SegmentStream(
+            track(lexer.wrap(raw, self.name, self.filename)), self.name, self.filename
+        )
+
+    def parse_statement(self) -> nodes.Node | list[nodes.Node]:
+        self._depth += 1
+
+        try:
+            rv = super().parse_statement()
+        finally:
+            self._depth -= 1
+
+        if self._depth or not rv:
+            return rv
+
+        token = self.stream.current
+        block_end = self._block_ends.get(id(token))
+
+        if block_end is not None and block_end[0] is token:
+            end = block_end[1]
+            self.statement_ends.append((rv[-1] if isinstance(rv, list) else rv, end))
+            self.resync_index = self._resync.get(end)
+
+            if self.resync_index is not None:
+                self.stream.stop = True  # type: ignore[attr-defined]
+
+        return rv
+
+
+class IncrementalParser:
+    """Parses the source of a template and keeps its abstract syntax
+    tree up to date as the source is edited. After an edit, the source
+    is tokenized again from the end of the last top-level statement
+    before the edit, and statements are parsed until one ends at the
+    same place it did before the edit. The nodes of all the following
+    statements are reused with their line numbers updated, so the cost
+    of an edit depends on the size of the statements it touches rather
+    than the size of the template.
+
+    .. code-block:: python
+
+        parser = IncrementalParser(env, "Hello {{ name }}!")
+        tree = parser.parse()
+        tree = parser.edit(6, 16, "{{ user.name }}")
+
+    The tree is the same as :meth:`Environment.parse` returns for the
+    edited source. Trees returned earlier share nodes with it and must
+    not be used after another edit.
+
+    Environments with extensions that preprocess the source or filter
+    the token stream parse the whole source on every edit.
+
+    :param environment: The environment to parse the template with.
+    :param source: The initial source of the template. Line breaks are
+        normalized to ``\\n``, and edit positions refer to the
+        normalized :attr:`source`.
+    :param name: The template name to show in error messages.
+    :param filename: The filename to show in error messages.
+
+    .. versionadded:: 3.2
+    """
+
+    def __init__(
+        self,
+        environment: "Environment",
+        source: str = "",
+        name: str | None = None,
+        filename: str | None = None,
+    ) -> None:
+        self.environment = environment
+        self.name = name
+        self.filename = filename
+        #: The current source of the template.
+        self.source = _normalize_newlines(str(source))
+        #: The tree of the last source that was parsed successfully.
+        self.tree: nodes.Template | None = None
+        self._segments: list[_Segment] | None = None
+        self._last_identifier = 0
+        self._incremental = all(
+            type(ext).preprocess is Extension.preprocess
+            and type(ext).filter_stream is Extension.filter_stream
+            for ext in environment.iter_extensions()
+        )
+
+    def parse(self) -> nodes.Template:
+        """Return the tree of the current source, parsing it if it
+        changed since the last call.
+
+        :raise TemplateSyntaxError: The source has a syntax error.
+        """
+        if self._segments is None or self.tree is None:
+            self._parse([], 0, 0, 0, 0)
+
+        return self.tree  # type: ignore[return-value]
+
+    def edit(self, start: int, end: int, text: str) -> nodes.Template:
+        """Replace the source between ``start`` and ``end`` with
+        ``text`` and return the updated tree.
+
+        If the edited source has a syntax error, the error is raised
+        and :attr:`tree` is left unchanged. The next call parses the
+        whole source again.
+
+        :param start: The index of the first replaced character.
+        :param end: The index after the last replaced character.
+        :param text: The text to insert.
+        :raise TemplateSyntaxError: The edited source has a syntax
+            error.
+        """
+        source = self.source
+
+        if not 0 <= start <= end <= len(source):
+            raise ValueError(f"Invalid edit range {start}:{end}.")
+
+        text = _normalize_newlines(text)
+        self.source = f"{source[:start]}{text}{source[end:]}"
+        segments = self._segments
+        self._segments = None
+
+        if segments is None or not self._incremental:
+            return self.parse()
+
+        # Tokenize again from the end of the segment before the one
+        # that contains the edit. A statement that ends right at the
+        # start is tokenized again as well, as its end tag may strip
+        # whitespace that follows it.
+        index = bisect_left(segments, start, key=lambda s: s.end)
+
+        # A final newline is not tokenized unless it's kept. If the edit
+        # is after it, the statement ending before it is tokenized again,
+        # as its end tag may strip the newline now.
+        if (
+            index
+            and not self.environment.keep_trailing_newline
+            and source[-1:] == "\n"
+            and segments[index - 1].end >= len(source) - 1
+        ):
+            index -= 1
+
+        self._parse(
+            segments,
+            index,
+            end,
+            len(text) - (end - start),
+            text.count("\n") - source.count("\n", start, end),
+        )
+        return self.tree  # type: ignore[return-value]
+
+    def _parse(
+        self,
+        segments: list[_Segment],
+        index: int,
+        end: int,
+        offset: int,
+        lines: int,
+    ) -> None:
+        """Parse the source from the end of the segment before
+        ``index``. Segments that ended after ``end`` are reused with
+        their positions moved by ``offset`` and their line numbers by
+        ``lines`` once a statement ends at the same place again.
+        """
+        environment = self.environment
+
+        if not self._incremental:
+            self.tree = environment.parse(self.source, self.name, self.filename)
+            return
+
+        new_segments = segments[:index]
+        # The character before a resync position must be after the
+        # edit, the lexer state depends on it.
+        resync = {
+            segment.end + offset: i
+            for i, segment in enumerate(segments[index:-1], index)
+            if segment.end > end
+        }
+        parser = _SegmentParser(
+            self, new_segments[-1].end if new_segments else 0, resync
+        )
+
+        try:
+            body = parser.subparse()
+        except TemplateSyntaxError:
+            environment.handle_exception(source=self.source)
+
+        self._last_identifier = parser._last_identifier
+        statement_ends = iter(parser.statement_ends)
+        statement_end = next(statement_ends, None)
+        current: list[nodes.Node] = []
+
+        for node in body:
+            node.set_environment(environment)
+            current.append(node)
+
+            if statement_end is not None and node is statement_end[0]:
+                new_segments.append(_Segment(statement_end[1], current))
+                current = []
+                statement_end = next(statement_ends, None)
+
+        if parser.resync_index is None:
+            new_segments.append(_Segment(len(self.source), current))
+        else:
+            for segment in segments[parser.resync_index + 1 :]:
+                if lines:
+                    for node in segment.nodes:
+                        node.lineno += lines
+
+                        for child in node.find_all(nodes.Node):
+                            child.lineno += lines
+
+                new_segments.append(_Segment(segment.end + offset, segment.nodes))
+
+        self._segments = new_segments
+        self.tree = nodes.Template(
+            [node for segment in new_segments for node in segment.nodes],
+            lineno=1,
+            environment=environment,
+        )
+
+
+def _normalize_newlines(source: str) -> str:
+    if "\r" in source:
+        return source.replace("\r\n", "\n").replace("\r", "\n")
+
+    return source
@@ -5,7 +5,9 @@ template code and python code in expressions.
 """
 
 import re
+import sys
 import typing as t
+from array import array
 from ast import literal_eval
 from collections import deque
 from sys import intern
@@ -425,6 +427,117 @@ class TokenStream:
         return next(self)
 
 
+class TokenBuffer:
+    """Stores the tokens of a template in parallel arrays of type
+    codes, line numbers, and the offsets of the values in the source,
+    instead of a :class:`Token` for each token. Values are sliced from
+    the source when a token is accessed, only values that are converted
+    by the lexer, such as numbers and strings, are stored. This uses a
+    fraction of the memory of a list of tokens, for tools that keep the
+    tokens of many templates.
+
+    The buffer can be iterated and indexed to get :class:`Token`\\s,
+    and :meth:`stream` returns a :class:`TokenStream` over it.
+
+    .. versionadded:: 3.2
+    """
+
+    def __init__(
+        self,
+        lexer: "Lexer",
+        source: str,
+        name: str | None = None,
+        filename: str | None = None,
+        state: str | None = None,
+    ) -> None:
+        if "\r" in source:
+            source = source.replace("\r\n", "\n").replace("\r", "\n")
+
+        self.source = source
+        self.name = name
+        self.filename = filename
+        self._types: list[str] = []
+        self._codes = array("H")
+        self._linenos = array("I")
+        self._starts = array("I")
+        self._ends = array("I")
+        self._values: dict[int, t.Any] = {}
+        codes: dict[str, int] = {}
+        # the value and position of the last token from the lexer,
+        # which wrap converts before reading the next one
+        last: list[t.Any] = [None, 0, 0]
+
+        def locate(
+            stream: t.Iterator[tuple[int, str, str]],
+        ) -> t.Iterator[tuple[int, str, str]]:
+            pos = 0
+
+            for item in stream:
+                value = item[2]
+                # Values are in order and only whitespace is skipped
+                # between them. Finding an equal value earlier gives the
+                # same slice.
+                start = source.find(value, pos)
+                pos = start + len(value)
+                last[:] = value, start, pos
+                yield item
+
+        tokens = lexer.tokeniter(source, name, filename, state)
+
+        for token in lexer.wrap(locate(tokens), name, filename):
+            code = codes.get(token.type)
+
+            if code is None:
+                code = codes[token.type] = len(self._types)
+                self._types.append(token.type)
+
+            value, start, end = last
+
+            if token.value is not value:
+                self._values[len(self._codes)] = token.value
+
+            self._codes.append(code)
+            self._linenos.append(token.lineno)
+            self._starts.append(start)
+            self._ends.append(end)
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def __getitem__(self, index: int) -> Token:
+        if index < 0:
+            index += len(self._codes)
+
+        type = self._types[self._codes[index]]
+        value = self._values.get(index)
+
+        if value is None:
+            value = self.source[self._starts[index] : self._ends[index]]
+
+        return Token(self._linenos[index], type, value)
+
+    def __iter__(self) -> t.Iterator[Token]:
+        source = self.source
+        types = self._types
+        values = self._values
+
+        for index, (code, lineno, start, end) in enumerate(
+            zip(self._codes, self._linenos, self._starts, self._ends, strict=True)
+        ):
+            value = values.get(index)
+
+            if value is None:
+                value = source[start:end]
+
+            yield Token(lineno, types[code], value)
+
+    def stream(self) -> TokenStream:
+        """Return a :class:`TokenStream` over the tokens, to pass them
+        to a :class:`~jinja2.parser.Parser`.
+        """
+        return TokenStream(self, self.name, self.filename)
+
+
 def get_lexer(environment: "Environment") -> "Lexer":
     """Return a lexer which is probably cached."""
     key = (
@@ -468,6 +581,46 @@ class _Rule(t.NamedTuple):
     command: str | None
 
 
+class _Scanner(t.NamedTuple):
+    regex: t.Pattern[str]
+    rules: dict[int, _Rule]
+
+
+_inline_flags = (
+    (re.IGNORECASE, "i"),
+    (re.MULTILINE, "m"),
+    (re.DOTALL, "s"),
+    (re.VERBOSE, "x"),
+)
+
+# the end rules are skipped while braces / parentheses are not balanced
+_balanced_end_tokens = (TOKEN_VARIABLE_END, TOKEN_BLOCK_END, TOKEN_LINESTATEMENT_END)
+
+
+def _compile_scanner(rules: t.Iterable[_Rule]) -> _Scanner:
+    """Combine the rules of a state into one regex so that a position is
+    matched with a single call instead of trying each rule in turn. Each
+    rule is wrapped in a group and the alternatives are tried in order,
+    so the first rule that matches wins.  The group of the matching rule
+    is the ``lastindex`` of the match and maps to the rule, its own groups
+    follow it.
+    """
+    parts = []
+    group_rules = {}
+    index = 1
+
+    for rule in rules:
+        pattern = rule.pattern
+        flags = "".join(c for flag, c in _inline_flags if pattern.flags & flag)
+        # end a trailing comment in a verbose pattern
+        end = "\n" if pattern.flags & re.VERBOSE else ""
+        parts.append(f"((?{flags}:{pattern.pattern}{end}))")
+        group_rules[index] = rule
+        index += pattern.groups + 1
+
+    return _Scanner(re.compile("|".join(parts)), group_rules)
+
+
 class Lexer:
     """Class that implements a lexer for a given environment. Automatically
     created by the environment class, usually you don't have to do that.
@@ -514,6 +667,21 @@ class Lexer:
         self.newline_sequence = environment.newline_sequence
         self.keep_trailing_newline = environment.keep_trailing_newline
 
+        # Without line statements and comments, a tag in the root state
+        # can only start with one of these strings, so the next tag can
+        # be found with str.find instead of matching the root regex.
+        self._root_start_strings: tuple[str, ...] | None = None
+
+        if (
+            environment.line_statement_prefix is None
+            and environment.line_comment_prefix is None
+        ):
+            self._root_start_strings = (
+                environment.block_start_string,
+                environment.variable_start_string,
+                environment.comment_start_string,
+            )
+
         root_raw_re = (
             rf"(?P<raw_begin>{block_start_re}(\-|\+|)\s*raw\s*"
             rf"(?:\-{block_end_re}\s*|{block_end_re}))"
@@ -595,10 +763,25 @@ class Lexer:
             ],
         }
 
+        # the rules of each state combined into one regex, also without
+        # the end rules for when braces / parentheses are not balanced
+        self._scanners = {
+            state: _compile_scanner(rules) for state, rules in self.rules.items()
+        }
+        self._unbalanced_scanners = {
+            state: _compile_scanner(
+                r for r in rules if r.tokens not in _balanced_end_tokens
+            )
+            for state, rules in self.rules.items()
+        }
+
     def _normalize_newlines(self, value: str) -> str:
         """Replace all newlines with the configured sequence in strings
         and template data.
         """
+        if self.newline_sequence == "\n" and "\r" not in value:
+            return value
+
         return newline_re.sub(self.newline_sequence, value)
 
     def tokenize(
@@ -680,184 +863,92 @@ class Lexer:
             Only ``\\n``, ``\\r\\n`` and ``\\r`` are treated as line
             breaks.
         """
-        lines = newline_re.split(source)[::2]
+        if "\r" in source:
+            source = source.replace("\r\n", "\n").replace("\r", "\n")
+
+        source_length = len(source)
 
-        if not self.keep_trailing_newline and lines[-1] == "":
-            del lines[-1]
+        # Ignore the trailing newline by ending all matches before it
+        # instead of copying the source without it.
+        if not self.keep_trailing_newline and source[-1:] == "\n":
+            source_length -= 1
 
-        source = "\n".join(lines)
-        pos = 0
-        lineno = 1
         stack = ["root"]
 
         if state is not None and state != "root":
             assert state in ("variable", "block"), "invalid state"
             stack.append(state + "_begin")
 
-        statetokens = self.rules[stack[-1]]
-        source_length = len(source)
+        yield from self._tokeniter(source, source_length, name, filename, stack)
+
+    def _tokeniter(
+        self,
+        source: str,
+        source_length: int,
+        name: str | None,
+        filename: str | None,
+        stack: list[str],
+        pos: int = 0,
+        lineno: int = 1,
+        cursor: list[int] | None = None,
+    ) -> t.Iterator[tuple[int, str, str]]:
+        """Tokenize the normalized source up to ``source_length``,
+        starting at ``pos`` on line ``lineno`` with the given state
+        stack. Starting in the root state after any tag gives the same
+        tokens as tokenizing from the beginning.
+
+        If ``cursor`` is given, its first item is set to the end of each
+        match before the tokens of the match are yielded.
+        """
+        state_name = stack[-1]
         balancing_stack: list[str] = []
         newlines_stripped = 0
-        line_starting = True
+        line_starting = pos == 0 or source[pos - 1] == "\n"
+        root_starts = self._root_start_strings
+        # the next position of each root start string, searched again
+        # once it's behind the current position
+        root_next = dict.fromkeys(root_starts or (), -1)
+        text: str | None = None
 
         while True:
-            # tokenizer loop
-            for regex, tokens, new_state in statetokens:
-                m = regex.match(source, pos)
-
-                # if no match we try again with the next rule
-                if m is None:
-                    continue
-
-                # we only match blocks and variables if braces / parentheses
-                # are balanced. continue parsing with the lower rule which
-                # is the operator rule. do this only if the end tags look
-                # like operators
-                if balancing_stack and tokens in (
-                    TOKEN_VARIABLE_END,
-                    TOKEN_BLOCK_END,
-                    TOKEN_LINESTATEMENT_END,
-                ):
-                    continue
-
-                # tuples support more options
-                if isinstance(tokens, tuple):
-                    groups: t.Sequence[str] = m.groups()
-
-                    if isinstance(tokens, OptionalLStrip):
-                        # Rule supports lstrip. Match will look like
-                        # text, block type, whitespace control, type, control, ...
-                        text = groups[0]
-                        # Skipping the text and first type, every other group is the
-                        # whitespace control for each type. One of the groups will be
-                        # -, +, or empty string instead of None.
-                        strip_sign = next(g for g in groups[2::2] if g is not None)
-
-                        if strip_sign == "-":
-                            # Strip all whitespace between the text and the tag.
-                            stripped = text.rstrip()
-                            newlines_stripped = text[len(stripped) :].count("\n")
-                            groups = [stripped, *groups[1:]]
-                        elif (
-                            # Not marked for preserving whitespace.
-                            strip_sign != "+"
-                            # lstrip is enabled.
-                            and self.lstrip_blocks
-                            # Not a variable expression.
-                            and not m.groupdict().get(TOKEN_VARIABLE_BEGIN)
-                        ):
-                            # The start of text between the last newline and the tag.
-                            l_pos = text.rfind("\n") + 1
-
-                            if l_pos > 0 or line_starting:
-                                # If there's only whitespace between the newline and the
-                                # tag, strip it.
-                                if whitespace_re.fullmatch(text, l_pos):
-                                    groups = [text[:l_pos], *groups[1:]]
-
-                    for idx, token in enumerate(tokens):
-                        # failure group
-                        if isinstance(token, Failure):
-                            raise token(lineno, filename)
-                        # bygroup is a bit more complex, in that case we
-                        # yield for the current token the first named
-                        # group that matched
-                        elif token == "#bygroup":
-                            for key, value in m.groupdict().items():
-                                if value is not None:
-                                    yield lineno, key, value
-                                    lineno += value.count("\n")
-                                    break
-                            else:
-                                raise RuntimeError(
-                                    f"{regex!r} wanted to resolve the token dynamically"
-                                    " but no group matched"
-                                )
-                        # normal group
-                        else:
-                            data = groups[idx]
+            # tokenizer loop, match all rules of the state at once. we
+            # only match blocks and variables if braces / parentheses are
+            # balanced, otherwise the end tags are skipped and parsing
+            # continues with the lower rule which is the operator rule.
+            if balancing_stack:
+                regex, group_rules = self._unbalanced_scanners[state_name]
+            else:
+                regex, group_rules = self._scanners[state_name]
 
-                            if data or token not in ignore_if_empty:
-                                yield lineno, token, data  # type: ignore[misc]
+            if root_starts is not None and state_name == "root":
+                # Find the next tag and match the root regex from there,
+                # with the text before it as the text group.
+                for start, found in root_next.items():
+                    if found < pos:
+                        found = source.find(start, pos, source_length)
+                        root_next[start] = found if found >= 0 else sys.maxsize
 
-                            lineno += data.count("\n") + newlines_stripped
-                            newlines_stripped = 0
+                tag_pos = min(root_next.values())
 
-                # strings as token just are yielded as it.
-                else:
-                    data = m.group()
-
-                    # update brace/parentheses balance
-                    if tokens == TOKEN_OPERATOR:
-                        if data == "{":
-                            balancing_stack.append("}")
-                        elif data == "(":
-                            balancing_stack.append(")")
-                        elif data == "[":
-                            balancing_stack.append("]")
-                        elif data in ("}", ")", "]"):
-                            if not balancing_stack:
-                                raise TemplateSyntaxError(
-                                    f"unexpected '{data}'", lineno, name, filename
-                                )
-
-                            expected_op = balancing_stack.pop()
-
-                            if expected_op != data:
-                                raise TemplateSyntaxError(
-                                    f"unexpected '{data}', expected '{expected_op}'",
-                                    lineno,
-                                    name,
-                                    filename,
-                                )
-
-                    # yield items
-                    if data or tokens not in ignore_if_empty:
-                        yield lineno, tokens, data
-
-                    lineno += data.count("\n")
-
-                line_starting = m.group()[-1:] == "\n"
-                # fetch new position into new variable so that we can check
-                # if there is a internal parsing error which would result
-                # in an infinite loop
-                pos2 = m.end()
-
-                # handle state changes
-                if new_state is not None:
-                    # remove the uppermost state
-                    if new_state == "#pop":
-                        stack.pop()
-                    # resolve the new state by group checking
-                    elif new_state == "#bygroup":
-                        for key, value in m.groupdict().items():
-                            if value is not None:
-                                stack.append(key)
-                                break
-                        else:
-                            raise RuntimeError(
-                                f"{regex!r} wanted to resolve the new state dynamically"
-                                f" but no group matched"
-                            )
-                    # direct state name given
-                    else:
-                        stack.append(new_state)
-
-                    statetokens = self.rules[stack[-1]]
-                # we are still at the same position and no stack change.
-                # this means a loop without break condition, avoid that and
-                # raise error
-                elif pos2 == pos:
-                    raise RuntimeError(
-                        f"{regex!r} yielded empty string without stack change"
-                    )
+                # the rest is data
+                if tag_pos == sys.maxsize:
+                    if cursor is not None:
+                        cursor[0] = source_length
+
+                    if pos < source_length:
+                        yield lineno, TOKEN_DATA, source[pos:source_length]
 
-                # publish new function and start again
-                pos = pos2
-                break
-            # if loop terminated without break we haven't found a single match
-            # either we are at the end of the file or we have a problem
+                    return
+
+                text = source[pos:tag_pos]
+                m = regex.match(source, tag_pos, source_length)
             else:
+                text = None
+                m = regex.match(source, pos, source_length)
+
+            # if no rule matched we are either at the end of the file or
+            # we have a problem
+            if m is None:
                 # end of text
                 if pos >= source_length:
                     return
@@ -866,3 +957,158 @@ class Lexer:
                 raise TemplateSyntaxError(
                     f"unexpected char {source[pos]!r} at {pos}", lineno, name, filename
                 )
+
+            if cursor is not None:
+                cursor[0] = m.end()
+
+            # the group wrapping the matching rule, followed by its groups
+            rule_index: int = m.lastindex  # type: ignore[assignment]
+            rule = group_rules[rule_index]
+            tokens = rule.tokens
+            new_state = rule.command
+            match = m.group(rule_index)
+
+            # tuples support more options
+            if isinstance(tokens, tuple):
+                groups: t.Sequence[str] = m.groups()[
+                    rule_index : rule_index + rule.pattern.groups
+                ]
+
+                if text is not None:
+                    groups = [text, *groups[1:]]
+
+                if isinstance(tokens, OptionalLStrip):
+                    # Rule supports lstrip. Match will look like
+                    # text, block type, whitespace control, type, control, ...
+                    text = groups[0]
+                    # Skipping the text and first type, every other group is the
+                    # whitespace control for each type. One of the groups will be
+                    # -, +, or empty string instead of None.
+                    strip_sign = next(g for g in groups[2::2] if g is not None)
+
+                    if strip_sign == "-":
+                        # Strip all whitespace between the text and the tag.
+                        stripped = text.rstrip()
+                        newlines_stripped = text[len(stripped) :].count("\n")
+                        groups = [stripped, *groups[1:]]
+                    elif (
+                        # Not marked for preserving whitespace.
+                        strip_sign != "+"
+                        # lstrip is enabled.
+                        and self.lstrip_blocks
+                        # Not a variable expression.
+                        and not (
+                            TOKEN_VARIABLE_BEGIN in rule.pattern.groupindex
+                            and m.group(TOKEN_VARIABLE_BEGIN)
+                        )
+                    ):
+                        # The start of text between the last newline and the tag.
+                        l_pos = text.rfind("\n") + 1
+
+                        if l_pos > 0 or line_starting:
+                            # If there's only whitespace between the newline and the
+                            # tag, strip it.
+                            if whitespace_re.fullmatch(text, l_pos):
+                                groups = [text[:l_pos], *groups[1:]]
+
+                for idx, token in enumerate(tokens):
+                    # failure group
+                    if isinstance(token, Failure):
+                        raise token(lineno, filename)
+                    # bygroup is a bit more complex, in that case we
+                    # yield for the current token the first named
+                    # group that matched
+                    elif token == "#bygroup":
+                        for key in rule.pattern.groupindex:
+                            value = m.group(key)
+
+                            if value is not None:
+                                yield lineno, key, value
+                                lineno += value.count("\n")
+                                break
+                        else:
+                            raise RuntimeError(
+                                f"{rule.pattern!r} wanted to resolve the token"
+                                " dynamically but no group matched"
+                            )
+                    # normal group
+                    else:
+                        data = groups[idx]
+
+                        if data or token not in ignore_if_empty:
+                            yield lineno, token, data  # type: ignore[misc]
+
+                        lineno += data.count("\n") + newlines_stripped
+                        newlines_stripped = 0
+
+            # strings as token just are yielded as it.
+            else:
+                data = match
+
+                # update brace/parentheses balance
+                if tokens == TOKEN_OPERATOR:
+                    if data == "{":
+                        balancing_stack.append("}")
+                    elif data == "(":
+                        balancing_stack.append(")")
+                    elif data == "[":
+                        balancing_stack.append("]")
+                    elif data in ("}", ")", "]"):
+                        if not balancing_stack:
+                            raise TemplateSyntaxError(
+                                f"unexpected '{data}'", lineno, name, filename
+                            )
+
+                        expected_op = balancing_stack.pop()
+
+                        if expected_op != data:
+                            raise TemplateSyntaxError(
+                                f"unexpected '{data}', expected '{expected_op}'",
+                                lineno,
+                                name,
+                                filename,
+                            )
+
+                # yield items
+                if data or tokens not in ignore_if_empty:
+                    yield lineno, tokens, data
+
+                lineno += data.count("\n")
+
+            line_starting = match[-1:] == "\n"
+            # fetch new position into new variable so that we can check
+            # if there is a internal parsing error which would result
+            # in an infinite loop
+            pos2 = m.end()
+
+            # handle state changes
+            if new_state is not None:
+                # remove the uppermost state
+                if new_state == "#pop":
+                    stack.pop()
+                # resolve the new state by group checking
+                elif new_state == "#bygroup":
+                    for key in rule.pattern.groupindex:
+                        if m.group(key) is not None:
+                            stack.append(key)
+                            break
+                    else:
+                        raise RuntimeError(
+                            f"{rule.pattern!r} wanted to resolve the new state"
+                            " dynamically but no group matched"
+                        )
+                # direct state name given
+                else:
+                    stack.append(new_state)
+
+                state_name = stack[-1]
+            # we are still at the same position and no stack change.
+            # this means a loop without break condition, avoid that and
+            # raise error
+            elif pos2 == pos:
+                raise RuntimeError(
+                    f"{rule.pattern!r} yielded empty string without stack change"
+                )
+
+            # publish new function and start again
+            pos = pos2
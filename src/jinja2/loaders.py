@@ -2,10 +2,14 @@
 sources.
 """
 
+import http.client
 import importlib.util
 import os
 import posixpath
+import queue
+import sqlite3
 import sys
+import threading
 import typing as t
 import weakref
 import zipimport
@@ -13,6 +17,8 @@ from collections import abc
 from hashlib import sha1
 from importlib import import_module
 from types import ModuleType
+from urllib.parse import quote
+from urllib.parse import urlsplit
 
 from .exceptions import TemplateNotFound
 from .utils import internalcode
@@ -494,6 +500,510 @@ class FunctionLoader(BaseLoader):
         return rv
 
 
+class _HTTPTemplate(t.NamedTuple):
+    source: str
+    etag: str | None
+    last_modified: str | None
+
+
+class HTTPLoader(BaseLoader):
+    """Load templates from a template server over HTTP.  The template
+    name is appended to the base URL.
+
+    .. code-block:: python
+
+        loader = HTTPLoader("http://templates.internal:8080/site/")
+
+    With this loader, ``users/list.html`` is requested from
+    ``http://templates.internal:8080/site/users/list.html``.  A response
+    with status 404 or 410 is treated as a missing template, other error
+    statuses raise an :exc:`OSError`.
+
+    Connections are kept alive and reused for later requests, up to
+    ``pool_size`` idle connections are kept open.
+
+    The ``uptodate`` function uses the ``ETag`` and ``Last-Modified``
+    headers of the response to send a conditional request, the template
+    is only reloaded if the server does not answer with ``304 Not
+    Modified``.  A changed template that was downloaded by the check is
+    used when the template is reloaded instead of downloading it again.
+    If the server can't be reached, the loaded template is kept.
+
+    If ``refresh_interval`` is given, the templates are revalidated in a
+    background thread every that many seconds instead, and ``uptodate``
+    only checks the result of the last refresh without making a request.
+    Call :meth:`close` to stop the thread and close the connections.
+
+    :param base_url: The ``http`` or ``https`` URL that template names
+        are relative to.
+    :param encoding: Use this encoding to decode the templates if the
+        response does not specify a charset.
+    :param timeout: Timeout in seconds for connecting and reading.
+    :param headers: Extra headers to send with every request, for
+        example for authorization.
+    :param pool_size: The number of idle connections to keep open.
+    :param refresh_interval: Revalidate the templates in a background
+        thread every that many seconds.
+
+    .. versionadded:: 3.2
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        encoding: str = "utf-8",
+        timeout: float | None = 10.0,
+        headers: t.Mapping[str, str] | None = None,
+        pool_size: int = 4,
+        refresh_interval: float | None = None,
+    ) -> None:
+        url = urlsplit(base_url)
+
+        if url.scheme not in {"http", "https"} or not url.netloc:
+            raise ValueError(f"Not an HTTP URL: {base_url!r}")
+
+        self.base_url = base_url
+        self.encoding = encoding
+        self.timeout = timeout
+        self.headers = dict(headers or ())
+        self.refresh_interval = refresh_interval
+        self._connection_class = (
+            http.client.HTTPSConnection
+            if url.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        self._host = url.netloc
+        self._path = url.path.rstrip("/")
+        self._pool: queue.LifoQueue[http.client.HTTPConnection] = queue.LifoQueue(
+            pool_size
+        )
+        # the loaded version of each template, and newer versions that
+        # were downloaded while checking if a template is up to date
+        self._current: dict[str, _HTTPTemplate] = {}
+        self._pending: dict[str, _HTTPTemplate] = {}
+        self._refresh_lock = threading.Lock()
+        self._refresh_stop: threading.Event | None = None
+        self._refresh_thread: threading.Thread | None = None
+
+    def _request(
+        self, path: str, headers: dict[str, str]
+    ) -> tuple[http.client.HTTPResponse, bytes]:
+        """Make a ``GET`` request with a pooled connection. A request on
+        a reused connection is retried with a new connection if the
+        connection was closed before the server responded, as the server
+        may have closed it while it was idle. Other errors, such as a
+        timeout while the server handles the request, are not retried.
+        """
+        headers = {**self.headers, **headers}
+
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+                reused = True
+            except queue.Empty:
+                conn = self._connection_class(self._host, timeout=self.timeout)
+                reused = False
+
+            try:
+                try:
+                    conn.request("GET", path, headers=headers)
+                    response = conn.getresponse()
+                except (BrokenPipeError, ConnectionAbortedError, ConnectionResetError):
+                    # Includes RemoteDisconnected, closed without a response.
+                    if reused:
+                        conn.close()
+                        continue
+
+                    raise
+
+                body = response.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                raise
+
+            if response.will_close:
+                conn.close()
+            else:
+                try:
+                    self._pool.put_nowait(conn)
+                except queue.Full:
+                    conn.close()
+
+            return response, body
+
+    def _fetch(
+        self, template: str, previous: _HTTPTemplate | None = None
+    ) -> _HTTPTemplate | None:
+        """Download a template. Returns ``None`` if it doesn't exist. If
+        a previous version is given, its validators are sent and it is
+        returned if the server reports that it was not modified.
+        """
+        pieces = split_template_path(template)
+        path = f"{self._path}/{quote('/'.join(pieces))}"
+        headers = {}
+
+        if previous is not None:
+            if previous.etag is not None:
+                headers["If-None-Match"] = previous.etag
+
+            if previous.last_modified is not None:
+                headers["If-Modified-Since"] = previous.last_modified
+
+        response, body = self._request(path, headers)
+
+        if response.status == 304 and previous is not None:
+            return previous
+
+        if response.status in {404, 410}:
+            return None
+
+        if response.status != 200:
+            raise OSError(
+                f"Loading template {template!r} failed with HTTP status"
+                f" {response.status} {response.reason}"
+            )
+
+        charset = response.headers.get_content_charset(self.encoding)
+        return _HTTPTemplate(
+            body.decode(charset),
+            response.getheader("ETag"),
+            response.getheader("Last-Modified"),
+        )
+
+    def _revalidate(self, template: str, current: _HTTPTemplate) -> bool:
+        """Check if the given version of a template is up to date,
+        remembering a newer version for the next :meth:`get_source`.
+        """
+        try:
+            latest = self._fetch(template, current)
+        except (OSError, http.client.HTTPException):
+            return True
+
+        if latest is current:
+            return True
+
+        if latest is not None and latest.source == current.source:
+            # Keep the new validators, so the next check can get a 304.
+            if self._current.get(template) is current:
+                self._current[template] = current._replace(
+                    etag=latest.etag, last_modified=latest.last_modified
+                )
+
+            return True
+
+        if latest is None:
+            self._current.pop(template, None)
+        else:
+            self._pending[template] = latest
+
+        return False
+
+    def get_source(
+        self, environment: "Environment", template: str
+    ) -> tuple[str, str, t.Callable[[], bool]]:
+        current = self._pending.pop(template, None)
+
+        if current is None:
+            current = self._fetch(template)
+
+            if current is None:
+                raise TemplateNotFound(template)
+
+        self._current[template] = current
+
+        if self.refresh_interval is not None:
+            self._start_refresh()
+
+        def uptodate() -> bool:
+            # The validators can be updated without changing the source.
+            latest = self._current.get(template)
+
+            if latest is None or latest.source is not current.source:
+                return False
+
+            if template in self._pending:
+                return False
+
+            if self.refresh_interval is not None:
+                return True
+
+            return self._revalidate(template, latest)
+
+        url = f"{self.base_url.rstrip('/')}/{template}"
+        return current.source, url, uptodate
+
+    def _start_refresh(self) -> None:
+        with self._refresh_lock:
+            if self._refresh_stop is not None:
+                return
+
+            self._refresh_stop = stop = threading.Event()
+            self._refresh_thread = thread = threading.Thread(
+                target=self._refresh_loop,
+                args=(weakref.ref(self), stop, self.refresh_interval),
+                name="jinja2-http-loader-refresh",
+                daemon=True,
+            )
+            thread.start()
+
+    @staticmethod
+    def _refresh_loop(
+        ref: "weakref.ref[HTTPLoader]", stop: threading.Event, interval: float
+    ) -> None:
+        # Only hold a weak reference while waiting so that the thread
+        # doesn't keep an unused loader alive.
+        while not stop.wait(interval):
+            loader = ref()
+
+            if loader is None:
+                return
+
+            for template, current in list(loader._current.items()):
+                if stop.is_set():
+                    break
+
+                if template not in loader._pending:
+                    loader._revalidate(template, current)
+
+            del loader
+
+    def close(self) -> None:
+        """Stop the background refresh and close the open connections.
+        Waits for a refresh that is in progress to finish, so that it
+        doesn't return a connection to the pool afterwards. The loader
+        can still be used afterwards.
+        """
+        with self._refresh_lock:
+            stop, thread = self._refresh_stop, self._refresh_thread
+            self._refresh_stop = self._refresh_thread = None
+
+        if stop is not None:
+            stop.set()
+
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class SQLiteLoader(BaseLoader):
+    """Load templates from a table in a SQLite database.  The table has a
+    column for the template name, its source, and a version that must
+    change whenever the source changes, for example a counter or the
+    modification time.
+
+    .. code-block:: sql
+
+        CREATE TABLE templates (
+            name TEXT PRIMARY KEY,
+            source TEXT NOT NULL,
+            version INTEGER NOT NULL
+        );
+
+    The ``uptodate`` function only queries the version of the template,
+    and :meth:`list_templates` only reads the index of names.
+
+    The templates referenced by each template with ``extends``,
+    ``include``, ``import`` and ``from`` can be stored in a second table,
+    see :meth:`update_references`.  If it exists, loading a template
+    fetches it together with all the templates it references, directly
+    or indirectly, in one query.  Loading those templates afterwards uses
+    the fetched source instead of querying the database again, as long
+    as the database wasn't changed in the meantime.  Fetched templates
+    that aren't loaded are discarded with the next query.
+
+    .. code-block:: sql
+
+        CREATE TABLE template_references (
+            name TEXT NOT NULL,
+            reference TEXT NOT NULL,
+            PRIMARY KEY (name, reference)
+        );
+
+    :param database: The path to the database file, or an open
+        connection.  If a path is given, each thread opens its own
+        connection.
+    :param table: The name of the table with the templates.
+    :param references_table: The name of the table with the references
+        between templates.
+
+    .. versionadded:: 3.2
+    """
+
+    def __init__(
+        self,
+        database: t.Union[str, "os.PathLike[str]", sqlite3.Connection],
+        table: str = "templates",
+        references_table: str = "template_references",
+    ) -> None:
+        self.database = database
+        self.table = table
+        self.references_table = references_table
+        self._local = threading.local()
+        self._has_references: bool | None = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """The connection to the database for the current thread."""
+        if isinstance(self.database, sqlite3.Connection):
+            return self.database
+
+        conn: sqlite3.Connection | None = getattr(self._local, "connection", None)
+
+        if conn is None:
+            self._local.connection = conn = sqlite3.connect(self.database)
+
+        return conn
+
+    def close(self) -> None:
+        """Close the connection opened by the current thread. A connection
+        that was passed to the loader is not closed.
+        """
+        self._local.__dict__.pop("prefetched", None)
+        conn = self._local.__dict__.pop("connection", None)
+
+        if conn is not None:
+            conn.close()
+
+    @staticmethod
+    def _quote(name: str) -> str:
+        return '"{}"'.format(name.replace('"', '""'))
+
+    def _fetch(self, template: str) -> dict[str, tuple[str, t.Any]]:
+        """Fetch the source and version of a template, together with all
+        the templates it references if the references table exists.
+        """
+        conn = self.connection
+        table = self._quote(self.table)
+
+        if self._has_references is None:
+            self._has_references = (
+                conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                    (self.references_table,),
+                ).fetchone()
+                is not None
+            )
+
+        if self._has_references:
+            rows = conn.execute(
+                "WITH RECURSIVE refs(name) AS ("
+                " VALUES (?) UNION SELECT r.reference"
+                f" FROM {self._quote(self.references_table)} AS r"
+                " JOIN refs ON r.name = refs.name"
+                f") SELECT t.name, t.source, t.version FROM {table} AS t"
+                " JOIN refs ON t.name = refs.name",
+                (template,),
+            )
+        else:
+            rows = conn.execute(
+                f"SELECT name, source, version FROM {table} WHERE name = ?",
+                (template,),
+            )
+
+        return {name: (source, version) for name, source, version in rows}
+
+    def _data_version(self) -> tuple[int, int]:
+        """Return a value that changes whenever the database is changed,
+        by the connection of this thread or any other connection.
+        """
+        conn = self.connection
+        return conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes
+
+    def get_source(
+        self, environment: "Environment", template: str
+    ) -> tuple[str, None, t.Callable[[], bool]]:
+        # Templates fetched along with another one are kept per thread,
+        # and only used while the database hasn't changed since.
+        prefetched = self._local.__dict__.pop("prefetched", None)
+        entry = None
+
+        if prefetched is not None:
+            data_version, fetched = prefetched
+
+            if data_version == self._data_version():
+                entry = fetched.pop(template, None)
+
+                if fetched:
+                    self._local.prefetched = prefetched
+
+        if entry is None:
+            data_version = self._data_version()
+            fetched = self._fetch(template)
+            entry = fetched.pop(template, None)
+
+            if fetched:
+                self._local.prefetched = (data_version, fetched)
+
+            if entry is None:
+                raise TemplateNotFound(template)
+
+        source, version = entry
+
+        def uptodate() -> bool:
+            row = self.connection.execute(
+                f"SELECT version FROM {self._quote(self.table)} WHERE name = ?",
+                (template,),
+            ).fetchone()
+            return row is not None and row[0] == version
+
+        return source, None, uptodate
+
+    def list_templates(self) -> list[str]:
+        rows = self.connection.execute(
+            f"SELECT name FROM {self._quote(self.table)} ORDER BY name"
+        )
+        return [name for (name,) in rows]
+
+    def update_references(
+        self, environment: "Environment", names: t.Iterable[str] | None = None
+    ) -> None:
+        """Parse templates and store the names of the templates they
+        reference in the references table, creating it if needed.  Only
+        references with a constant name are stored.  Call this after
+        changing templates, for all templates if ``names`` is not given.
+
+        :param environment: The environment used to parse the templates.
+        :param names: The names of the templates to update.
+        """
+        from .meta import find_referenced_templates
+
+        conn = self.connection
+        table = self._quote(self.table)
+        references_table = self._quote(self.references_table)
+
+        if names is None:
+            names = self.list_templates()
+
+        with conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {references_table} ("
+                " name TEXT NOT NULL, reference TEXT NOT NULL,"
+                " PRIMARY KEY (name, reference))"
+            )
+
+            for name in names:
+                row = conn.execute(
+                    f"SELECT source FROM {table} WHERE name = ?", (name,)
+                ).fetchone()
+                conn.execute(f"DELETE FROM {references_table} WHERE name = ?", (name,))
+
+                if row is None:
+                    continue
+
+                references = find_referenced_templates(environment.parse(row[0], name))
+                conn.executemany(
+                    f"INSERT OR IGNORE INTO {references_table} VALUES (?, ?)",
+                    [(name, ref) for ref in references if ref is not None],
+                )
+
+        self._has_references = True
+
+
 class PrefixLoader(BaseLoader):
     """A loader that is passed a dict of loaders where each loader is bound
     to a prefix.  The prefix is delimited from the template by a slash per
@@ -6,6 +6,7 @@ from itertools import islice
 from types import GeneratorType
 
 from . import nodes
+from .async_utils import run_until_complete
 from .compiler import CodeGenerator
 from .compiler import Frame
 from .compiler import has_safe_repr
@@ -102,6 +103,9 @@ class NativeTemplate(Template):
         with :func:`ast.literal_eval`, the parsed value is returned.
         Otherwise, the string is returned.
         """
+        if self.environment.is_async:
+            return run_until_complete(self.render_async(*args, **kwargs))
+
         ctx = self.new_context(dict(*args, **kwargs))
 
         try:
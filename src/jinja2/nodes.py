@@ -54,7 +54,8 @@ class Impossible(Exception):
 class NodeType(type):
     """A metaclass for nodes that handles the field and attribute
     inheritance.  fields and attributes from the parent class are
-    automatically forwarded to the child."""
+    automatically forwarded to the child.  The fields and attributes
+    are stored in slots instead of an instance dict."""
 
     def __new__(mcs, name, bases, d):  # type: ignore
         for attr in "fields", "attributes":
@@ -64,6 +65,11 @@ class NodeType(type):
             assert len(bases) <= 1, "multiple inheritance not allowed"
             assert len(storage) == len(set(storage)), "layout conflict"
             d[attr] = tuple(storage)
+        base = bases[0] if bases else object
+        inherited = getattr(base, "fields", ()) + getattr(base, "attributes", ())
+        d["__slots__"] = tuple(
+            slot for slot in d["fields"] + d["attributes"] if slot not in inherited
+        )
         d.setdefault("abstract", False)
         return type.__new__(mcs, name, bases, d)
 
@@ -102,6 +108,18 @@ def get_eval_context(node: "Node", ctx: EvalContext | None) -> EvalContext:
     return ctx
 
 
+def _defined(value: t.Any) -> t.Any:
+    """Raise :exc:`Impossible` for an undefined value, it must be
+    handled at runtime where the undefined type can fail or be replaced.
+    """
+    from .runtime import Undefined
+
+    if isinstance(value, Undefined):
+        raise Impossible()
+
+    return value
+
+
 class Node(metaclass=NodeType):
     """Baseclass for all Jinja nodes.  There are a number of nodes available
     of different types.  There are four major types:
@@ -245,6 +263,21 @@ class Node(metaclass=NodeType):
 
     __hash__ = object.__hash__
 
+    def __getstate__(self) -> dict[str, t.Any]:
+        state = {}
+
+        for name in self.fields + self.attributes:
+            try:
+                state[name] = getattr(self, name)
+            except AttributeError:
+                pass
+
+        return state
+
+    def __setstate__(self, state: dict[str, t.Any]) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def __repr__(self) -> str:
         args_str = ", ".join(f"{a}={getattr(self, a, None)!r}" for a in self.fields)
         return f"{type(self).__name__}({args_str})"
@@ -775,10 +808,12 @@ class _FilterTestCommon(Expr):
             args.insert(0, eval_ctx.environment)
 
         try:
-            return func(*args, **kwargs)
+            rv = func(*args, **kwargs)
         except Exception as e:
             raise Impossible() from e
 
+        return _defined(rv)
+
 
 class Filter(_FilterTestCommon):
     """Apply a filter to an expression. ``name`` is the name of the
@@ -841,12 +876,14 @@ class Getitem(Expr):
         eval_ctx = get_eval_context(self, eval_ctx)
 
         try:
-            return eval_ctx.environment.getitem(
+            rv = eval_ctx.environment.getitem(
                 self.node.as_const(eval_ctx), self.arg.as_const(eval_ctx)
             )
         except Exception as e:
             raise Impossible() from e
 
+        return _defined(rv)
+
 
 class Getattr(Expr):
     """Get an attribute or item from an expression that is a ascii-only
@@ -865,10 +902,12 @@ class Getattr(Expr):
         eval_ctx = get_eval_context(self, eval_ctx)
 
         try:
-            return eval_ctx.environment.getattr(self.node.as_const(eval_ctx), self.attr)
+            rv = eval_ctx.environment.getattr(self.node.as_const(eval_ctx), self.attr)
         except Exception as e:
             raise Impossible() from e
 
+        return _defined(rv)
+
 
 class Slice(Expr):
     """Represents a slice object.  This must only be used as argument for
@@ -1142,6 +1181,14 @@ class Break(Stmt):
     """Break a loop."""
 
 
+class Flush(Stmt):
+    """Mark a point where the output rendered so far should be sent
+    on, see :class:`~jinja2.ext.FlushExtension`.
+
+    .. versionadded:: 3.2
+    """
+
+
 class Scope(Stmt):
     """An artificial scope."""
 
@@ -10,6 +10,8 @@ that stored the scoping rules.
 
 import typing as t
 
+from markupsafe import Markup
+
 from . import nodes
 from .visitor import NodeTransformer
 
@@ -46,3 +48,246 @@ class Optimizer(NodeTransformer):
                 pass
 
         return node
+
+    def visit_CondExpr(
+        self, node: nodes.CondExpr, *args: t.Any, **kwargs: t.Any
+    ) -> nodes.Node:
+        rv = self.generic_visit(node, *args, **kwargs)
+
+        # Drop the branch that can't be taken if only the test is
+        # constant. Without an else branch the undefined value is
+        # created at runtime.
+        if isinstance(rv, nodes.CondExpr) and isinstance(rv.test, nodes.Const):
+            if rv.test.value:
+                return rv.expr1
+
+            if rv.expr2 is not None:
+                return rv.expr2
+
+        return rv
+
+
+#: Names that can refer to a different value than an assignment in the
+#: template, depending on the scope they are loaded in.
+_implicit_names = frozenset(("self", "super", "caller", "kwargs", "varargs", "loop"))
+
+
+def _is_immutable(value: t.Any) -> bool:
+    """Can a value be copied into the places it is used without changing
+    what the template does? Mutable values can't, a method like
+    ``append`` would only change the copy.
+    """
+    if value is None or type(value) in {bool, int, float, complex, range, str, Markup}:
+        return True
+
+    if type(value) is tuple:
+        return all(_is_immutable(v) for v in value)
+
+    return False
+
+
+def _const_test(node: nodes.Node, eval_ctx: nodes.EvalContext) -> bool | None:
+    """Return the truth value of a test if it is constant, otherwise
+    ``None``.
+    """
+    try:
+        return bool(t.cast(nodes.Expr, node).as_const(eval_ctx))
+    except nodes.Impossible:
+        return None
+
+
+def _replace_names(node: nodes.Node, constants: dict[str, t.Any]) -> nodes.Node:
+    """Return the node with the loads of the given names replaced by
+    their constant values. Nodes that don't contain such a load are
+    shared with the original tree, which is not modified. Overlays are
+    left alone, they provide names at runtime.
+    """
+    if isinstance(node, nodes.Name):
+        if node.ctx == "load" and node.name in constants:
+            return nodes.Const(
+                constants[node.name],
+                lineno=node.lineno,
+                environment=node.environment,
+            )
+
+        return node
+
+    if isinstance(node, nodes.OverlayScope):
+        return node
+
+    changed: dict[str, t.Any] = {}
+
+    for field, value in node.iter_fields():
+        if isinstance(value, list):
+            new = [
+                _replace_names(v, constants) if isinstance(v, nodes.Node) else v
+                for v in value
+            ]
+
+            if any(a is not b for a, b in zip(new, value, strict=True)):
+                changed[field] = new
+        elif isinstance(value, nodes.Node):
+            new_node = _replace_names(value, constants)
+
+            if new_node is not value:
+                changed[field] = new_node
+
+    if not changed:
+        return node
+
+    rv = object.__new__(type(node))
+
+    for field, value in node.iter_fields():
+        setattr(rv, field, changed.get(field, value))
+
+    for attr in node.attributes:
+        setattr(rv, attr, getattr(node, attr))
+
+    return rv
+
+
+class _BranchAnalyzer:
+    """Find the tests of ``if`` tags and conditional expressions that are
+    constant once the names assigned a constant are replaced. The tree is
+    not changed, so the scoping analysis of the compiler still sees all
+    the branches.
+    """
+
+    def __init__(self, eval_ctx: nodes.EvalContext, names: set[str]) -> None:
+        self.eval_ctx = eval_ctx
+        self.names = names
+        #: The constant truth value of each test that has one.
+        self.tests: dict[nodes.Node, bool] = {}
+
+    def visit_body(self, body: list[nodes.Node], constants: dict[str, t.Any]) -> None:
+        for node in body:
+            self.visit_statement(node, constants)
+
+            if (
+                isinstance(node, nodes.Assign)
+                and isinstance(node.target, nodes.Name)
+                and node.target.name in self.names
+            ):
+                try:
+                    value = t.cast(nodes.Expr, node.node).as_const(self.eval_ctx)
+                except nodes.Impossible:
+                    continue
+
+                if _is_immutable(value):
+                    constants[node.target.name] = value
+
+    def visit_statement(self, node: nodes.Node, constants: dict[str, t.Any]) -> None:
+        # Blocks can be rendered before the assignment through
+        # ``self``, and overlays provide names at runtime.
+        if isinstance(node, (nodes.Block, nodes.OverlayScope)):
+            return
+
+        if isinstance(node, nodes.If):
+            self.visit_test(node.test, constants)
+
+        for _, value in node.iter_fields():
+            if isinstance(value, list):
+                if value and isinstance(value[0], nodes.Stmt):
+                    # Assignments in a nested body only apply to the
+                    # rest of that body.
+                    self.visit_body(value, dict(constants))
+                else:
+                    for child in value:
+                        if isinstance(child, nodes.Node):
+                            self.visit_expr(child, constants)
+            elif isinstance(value, nodes.Node):
+                self.visit_expr(value, constants)
+
+    def visit_test(self, node: nodes.Node, constants: dict[str, t.Any]) -> None:
+        if constants:
+            test = _replace_names(node, constants)
+        else:
+            test = node
+
+        value = _const_test(test, self.eval_ctx)
+
+        if value is not None:
+            self.tests[node] = value
+
+    def visit_expr(self, node: nodes.Node, constants: dict[str, t.Any]) -> None:
+        if isinstance(node, nodes.CondExpr):
+            self.visit_test(node.test, constants)
+
+        for child in node.iter_child_nodes():
+            self.visit_expr(child, constants)
+
+
+def optimize_template(
+    node: nodes.Template,
+    eval_ctx: nodes.EvalContext,
+    constants: dict[str, t.Any] | None = None,
+) -> tuple[nodes.Template, dict[nodes.Node, bool]]:
+    """Prepare a template for the compiler without modifying it.
+
+    Returns the template with the loads of the given constant globals
+    replaced by their values, unless the template assigns the name
+    itself, sharing the unchanged nodes with the original tree. Also
+    returns the truth values of the tests of ``if`` tags and conditional
+    expressions that are constant. Names that are assigned exactly once,
+    with a ``{% set %}`` of an immutable constant, count as that constant
+    in the tests after the assignment in the same scope. The compiler
+    leaves out the branches that are never taken.
+
+    Templates that change the evaluation context with
+    ``{% autoescape %}`` have no constant tests, their value could depend
+    on it.
+    """
+    bindings: dict[str, int] = {}
+    modifies_eval_ctx = False
+
+    for child in node.find_all(
+        (
+            nodes.Name,
+            nodes.Import,
+            nodes.FromImport,
+            nodes.Macro,
+            nodes.EvalContextModifier,
+        )
+    ):
+        if isinstance(child, nodes.EvalContextModifier):
+            modifies_eval_ctx = True
+            continue
+
+        if isinstance(child, nodes.Name):
+            if child.ctx == "load":
+                continue
+
+            bound = [child.name]
+        elif isinstance(child, nodes.Import):
+            bound = [child.target]
+        elif isinstance(child, nodes.FromImport):
+            bound = [n[1] if isinstance(n, tuple) else n for n in child.names]
+        else:
+            bound = [t.cast(nodes.Macro, child).name]
+
+        for name in bound:
+            bindings[name] = bindings.get(name, 0) + 1
+
+    if constants:
+        constants = {
+            name: value
+            for name, value in constants.items()
+            if name not in bindings and name not in _implicit_names
+        }
+
+        if constants:
+            # The names are never assigned, so replacing their loads
+            # doesn't change how other names are resolved.
+            node = t.cast(nodes.Template, _replace_names(node, constants))
+
+    if modifies_eval_ctx:
+        return node, {}
+
+    names = {
+        name
+        for name, count in bindings.items()
+        if count == 1 and name not in _implicit_names
+    }
+    analyzer = _BranchAnalyzer(eval_ctx, names)
+    analyzer.visit_body(node.body, {})
+    return node, analyzer.tests
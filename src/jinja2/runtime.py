@@ -4,14 +4,18 @@ import functools
 import sys
 import typing as t
 from collections import abc
+from inspect import isawaitable  # noqa: F401
 from itertools import chain
 
 from markupsafe import escape  # noqa: F401
 from markupsafe import Markup
 from markupsafe import soft_str
 
+from .async_utils import _common_primitives  # noqa: F401
 from .async_utils import auto_aiter
 from .async_utils import auto_await  # noqa: F401
+from .async_utils import close_awaitables  # noqa: F401
+from .async_utils import gather_awaitables  # noqa: F401
 from .exceptions import TemplateNotFound  # noqa: F401
 from .exceptions import TemplateRuntimeError  # noqa: F401
 from .exceptions import UndefinedError
@@ -59,11 +63,17 @@ exported = [
     "Namespace",
     "Undefined",
     "internalcode",
+    "render_to_buffer",
+    "flush_marker",
 ]
 async_exported = [
     "AsyncLoopContext",
     "auto_aiter",
     "auto_await",
+    "close_awaitables",
+    "gather_awaitables",
+    "isawaitable",
+    "_common_primitives",
 ]
 
 
@@ -85,11 +95,41 @@ def markup_join(seq: t.Iterable[t.Any]) -> str:
     return concat(buf)
 
 
+class _FlushMarker(str):
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "flush_marker"
+
+
+#: The empty string a template yields for a ``{% flush %}`` tag. Output
+#: that was buffered before it should be sent on.
+flush_marker = _FlushMarker()
+
+
 def str_join(seq: t.Iterable[t.Any]) -> str:
     """Simple args to string conversion and concatenation."""
     return concat(map(str, seq))
 
 
+@internalcode
+def render_to_buffer(
+    func: t.Callable[["Context"], t.Iterator[str]],
+    context: "Context",
+    buffer: list[str],
+) -> None:
+    """Append the output of a root or block render function to a
+    buffer. The buffered variant of the function is used if the
+    compiler generated one.
+    """
+    buffered = getattr(func, "buffered", None)
+
+    if buffered is None:
+        buffer.extend(func(context))
+    else:
+        buffered(context, buffer)
+
+
 def new_context(
     environment: "Environment",
     template_name: str | None,
@@ -3,12 +3,14 @@ import json
 import os
 import re
 import typing as t
+import weakref
 from collections import abc
 from collections import deque
 from random import choice
 from random import randrange
 from threading import Lock
 from types import CodeType
+from types import ModuleType
 from urllib.parse import quote_from_bytes
 
 import markupsafe
@@ -125,16 +127,131 @@ def consume(iterable: t.Iterable[t.Any]) -> None:
 
 
 def clear_caches() -> None:
-    """Jinja keeps internal caches for environments and lexers.  These are
-    used so that Jinja doesn't have to recreate environments and lexers all
+    """Jinja keeps internal caches for environments, lexers and code
+    shared between environments.  These are used so that Jinja doesn't
+    have to recreate environments and lexers or recompile templates all
     the time.  Normally you don't have to care about that but if you are
     measuring memory consumption you may want to clean the caches.
     """
+    from .environment import _code_cache
     from .environment import get_spontaneous_environment
     from .lexer import _lexer_cache
 
     get_spontaneous_environment.cache_clear()
     _lexer_cache.clear()
+    _code_cache.clear()
+
+
+class _IdentityKey:
+    """Cache key part that is equal only to keys for the same object.
+    It keeps the object alive so its ``id`` can't be reused.
+    """
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj: t.Any) -> None:
+        self.obj = obj
+
+    def __hash__(self) -> int:
+        return id(self.obj)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _IdentityKey) and other.obj is self.obj
+
+
+def _object_key(obj: t.Any) -> t.Hashable:
+    """Return a cache key part for a callable or other configuration
+    object. Simple values are used as they are. Other objects are held
+    weakly if possible, so a cache doesn't keep them alive, and a key
+    for an object that was collected never equals a key for a new one.
+    """
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+
+    if type(obj) is tuple:
+        return tuple(_object_key(x) for x in obj)
+
+    try:
+        key = weakref.ref(obj)
+        hash(key)
+    except TypeError:
+        return _IdentityKey(obj)
+
+    return key
+
+
+def _stable_repr(key: t.Any) -> str:
+    """Return a representation of a cache key made with
+    :func:`_object_key` that is the same in another process for the same
+    configuration, for keys of persistent caches. Functions and classes
+    are described by their import path. Other objects, and functions
+    without one such as lambdas, are described by their ``repr``, which
+    usually contains their address, so they only match in this process.
+    """
+    if type(key) is tuple:
+        return f"({', '.join(_stable_repr(x) for x in key)},)"
+
+    if isinstance(key, weakref.ref):
+        key = key()
+    elif isinstance(key, _IdentityKey):
+        key = key.obj
+
+    module = getattr(key, "__module__", None)
+    qualname = getattr(key, "__qualname__", None)
+    bound = getattr(key, "__self__", None)
+
+    if (
+        isinstance(module, str)
+        and isinstance(qualname, str)
+        and "<" not in qualname
+        and (bound is None or isinstance(bound, ModuleType))
+    ):
+        return f"{module}.{qualname}"
+
+    return repr(key)
+
+
+class _VersionedDict(dict):  # type: ignore[type-arg]
+    """A dict that counts how often it was changed, so that values
+    computed from it can be cached until it changes.
+    """
+
+    version = 0
+
+    def __setitem__(self, key: t.Any, value: t.Any) -> None:
+        super().__setitem__(key, value)
+        self.version += 1
+
+    def __delitem__(self, key: t.Any) -> None:
+        super().__delitem__(key)
+        self.version += 1
+
+    def __ior__(self, other: t.Any) -> "te.Self":  # type: ignore[misc]
+        self.update(other)
+        return self
+
+    def update(self, *args: t.Any, **kwargs: t.Any) -> None:
+        super().update(*args, **kwargs)
+        self.version += 1
+
+    def setdefault(self, key: t.Any, default: t.Any = None) -> t.Any:
+        self.version += 1
+        return super().setdefault(key, default)
+
+    def pop(self, *args: t.Any) -> t.Any:
+        self.version += 1
+        return super().pop(*args)
+
+    def popitem(self) -> tuple[t.Any, t.Any]:
+        self.version += 1
+        return super().popitem()
+
+    def clear(self) -> None:
+        super().clear()
+        self.version += 1
+
+    def copy(self) -> "_VersionedDict":
+        return type(self)(self)
 
 
 def import_string(import_name: str, silent: bool = False) -> t.Any:
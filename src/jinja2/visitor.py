@@ -3,6 +3,8 @@ meta introspection.
 """
 
 import typing as t
+from functools import partial
+from types import FunctionType
 
 from .nodes import Node
 
@@ -23,8 +25,26 @@ class NodeVisitor:
     be `visit_TryFinally`.  This behavior can be changed by overriding
     the `get_visitor` function.  If no visitor function exists for a node
     (return value `None`) the `generic_visit` visitor is used instead.
+
+    Unless `get_visitor` is overridden, the visitor function of each
+    class is looked up once per node type, the first time a node of that
+    type is visited.  Visitor functions set on an instance, or set on
+    the class after that, are not used.
     """
 
+    #: Maps node types to the function that visits them, filled on first
+    #: use. `None` if the class overrides :meth:`get_visitor`, which is
+    #: then called for every node instead.
+    _visitors: t.ClassVar[dict[type[Node], t.Callable[..., t.Any]] | None] = {}
+
+    def __init_subclass__(cls, **kwargs: t.Any) -> None:
+        super().__init_subclass__(**kwargs)
+
+        if cls.get_visitor is NodeVisitor.get_visitor:
+            cls._visitors = {}
+        else:
+            cls._visitors = None
+
     def get_visitor(self, node: Node) -> "VisitCallable | None":
         """Return the visitor function for this node or `None` if no visitor
         exists for this node.  In that case the generic visit function is
@@ -34,6 +54,16 @@ class NodeVisitor:
 
     def visit(self, node: Node, *args: t.Any, **kwargs: t.Any) -> t.Any:
         """Visit a node."""
+        visitors = self._visitors
+
+        if visitors is not None:
+            try:
+                func = visitors[type(node)]
+            except KeyError:
+                func = visitors[type(node)] = _find_visitor(type(self), type(node))
+
+            return func(self, node, *args, **kwargs)
+
         f = self.get_visitor(node)
 
         if f is not None:
@@ -47,6 +77,34 @@ class NodeVisitor:
             self.visit(child_node, *args, **kwargs)
 
 
+def _find_visitor(
+    cls: type[NodeVisitor], node_type: type[Node]
+) -> t.Callable[..., t.Any]:
+    """Return the function that visits the node type for the class,
+    called with the visitor and the node. That is the ``visit_`` or
+    ``generic_visit`` function of the class, or a function that gets the
+    method from the visitor if it isn't a plain function, such as a
+    ``staticmethod``.
+    """
+    for name in (f"visit_{node_type.__name__}", "generic_visit"):
+        for base in cls.__mro__:
+            if name in base.__dict__:
+                func = base.__dict__[name]
+
+                if isinstance(func, FunctionType):
+                    return func
+
+                return partial(_call_method, name)
+
+    raise AssertionError("generic_visit is always defined")
+
+
+def _call_method(
+    name: str, visitor: NodeVisitor, node: Node, *args: t.Any, **kwargs: t.Any
+) -> t.Any:
+    return getattr(visitor, name)(node, *args, **kwargs)
+
+
 class NodeTransformer(NodeVisitor):
     """Walks the abstract syntax tree and allows modifications of nodes.
 
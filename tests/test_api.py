@@ -1,5 +1,12 @@
+import gc
+import io
+import pickle
 import shutil
 import tempfile
+import threading
+import time
+import weakref
+from concurrent.futures import Future
 from pathlib import Path
 
 import pytest
@@ -8,6 +15,7 @@ from jinja2 import ChainableUndefined
 from jinja2 import DebugUndefined
 from jinja2 import DictLoader
 from jinja2 import Environment
+from jinja2 import FunctionLoader
 from jinja2 import is_undefined
 from jinja2 import make_logging_undefined
 from jinja2 import meta
@@ -233,6 +241,22 @@ class TestStreaming:
         assert next(stream) == "<ul><li>1"
         assert next(stream) == " - 0</li>"
 
+    def test_buffered_streaming_chars(self, env):
+        tmpl = env.from_string("{% for item in seq %}{{ item }}{% endfor %}")
+        stream = tmpl.stream(seq=["a", "", "bcd", "efghi", "j"])
+        stream.enable_buffering(size=3, chars=True)
+        assert list(stream) == ["abcd", "efghi", "j"]
+
+    def test_buffered_streaming_latency(self, env):
+        def slow(x):
+            time.sleep(0.02)
+            return x
+
+        tmpl = env.from_string("{% for item in seq %}{{ f(item) }}{% endfor %}")
+        stream = tmpl.stream(seq="abc", f=slow)
+        stream.enable_buffering(size=100, max_latency=0.01)
+        assert list(stream) == ["ab", "c"]
+
     def test_streaming_behavior(self, env):
         tmpl = env.from_string("")
         stream = tmpl.stream()
@@ -252,6 +276,141 @@ class TestStreaming:
         finally:
             shutil.rmtree(tmp)
 
+    def test_dump_stream_incremental_encoding(self, env):
+        tmpl = env.from_string("{% for item in seq %}{{ item }}{% endfor %}")
+        f = io.BytesIO()
+        tmpl.stream(seq="ab\u2713").dump(f, "utf-16")
+        assert f.getvalue() == "ab\u2713".encode("utf-16")
+
+    def test_dump_stream_buffered(self, env):
+        class File:
+            def __init__(self):
+                self.data = []
+
+            def write(self, data):
+                self.data.append(data)
+
+        tmpl = env.from_string("{% for item in seq %}{{ item }}{% endfor %}")
+        f = File()
+        tmpl.stream(seq="abcde").dump(f, "utf-8")
+        assert f.data == [b"abcde"]
+        f = File()
+        stream = tmpl.stream(seq="abcde")
+        stream.enable_buffering(2)
+        stream.dump(f, "utf-16")
+        assert b"".join(f.data) == "abcde".encode("utf-16")
+        assert [len(data) for data in f.data] == [6, 4, 2]
+
+
+class TestRenderInto:
+    source = "{% for i in range(3) %}<{{ i }}>{% endfor %}{{ x }}"
+
+    def test_callable(self, env):
+        tmpl = env.from_string(self.source)
+        out = []
+        tmpl.render_into(out.append, x="!")
+        assert out == ["<", "0", ">", "<", "1", ">", "<", "2", ">", "!"]
+
+    def test_file(self, env):
+        tmpl = env.from_string(self.source)
+        f = io.StringIO()
+        tmpl.render_into(f, {"x": "!"})
+        assert f.getvalue() == "<0><1><2>!"
+
+    def test_buffer_size(self, env):
+        tmpl = env.from_string(self.source)
+        out = []
+        tmpl.render_into(out.append, buffer_size=4, x="!")
+        assert out == ["<0><1>", "<2>!"]
+
+    def test_bytes(self, env):
+        tmpl = env.from_string(self.source)
+        out = bytearray()
+        tmpl.render_into(out, buffer_size=4, output_encoding="utf-8", x="ä")
+        assert out == "<0><1><2>ä".encode()
+
+    def test_bytes_file(self, env):
+        tmpl = env.from_string(self.source)
+        f = io.BytesIO()
+        tmpl.render_into(f, output_encoding="utf-16", x="!")
+        # The byte order mark is only written once.
+        assert f.getvalue() == "<0><1><2>!".encode("utf-16")
+
+    def test_bytes_errors(self, env):
+        tmpl = env.from_string(self.source)
+        f = io.BytesIO()
+
+        with pytest.raises(UnicodeEncodeError):
+            tmpl.render_into(f, output_encoding="ascii", x="ä")
+
+        f = io.BytesIO()
+        tmpl.render_into(f, output_encoding="ascii", output_errors="replace", x="ä")
+        assert f.getvalue() == b"<0><1><2>?"
+
+    def test_extends_include(self):
+        env = Environment(
+            loader=DictLoader(
+                {
+                    "base": "[{% block a %}{% endblock %}]",
+                    "inc": "{{ x }}",
+                    "child": "{% extends 'base' %}"
+                    "{% block a %}{% include 'inc' %}{% endblock %}",
+                }
+            )
+        )
+        f = io.StringIO()
+        env.get_template("child").render_into(f, x=1)
+        assert f.getvalue() == "[1]"
+
+    def test_error(self, env):
+        tmpl = env.from_string("a{{ 1 / 0 }}")
+        out = []
+
+        with pytest.raises(ZeroDivisionError):
+            tmpl.render_into(out.append, buffer_size=10)
+
+        assert out == []
+
+
+class TestBufferedRender:
+    templates = {
+        "base": "<{% block a %}A{% endblock %}|{% block a_buffered %}B{% endblock %}>"
+        "{{ self.a() }}",
+        "child": "{% extends 'base' %}{% block a %}[{{ super() }}]{% endblock %}",
+        "inc": "{{ x }}{% include 'child' %}",
+        "macro": "{% macro m() %}({% include 'inc' without context %}"
+        "{% include 'inc' %}){% endmacro %}{% set x = 1 %}{{ m() }}",
+        "loop": "{% for i in [[1, [2]], [3]] recursive %}{{ i if i is number"
+        " else loop(i) }}{% endfor %}{% filter upper %}{% block b %}b"
+        "{% endblock %}{% endfilter %}",
+        "import": "{% import 'macro' as m %}{{ m.m() }}",
+    }
+
+    @pytest.mark.parametrize("name", templates)
+    def test_same_as_generate(self, name):
+        env = Environment(loader=DictLoader(self.templates))
+        tmpl = env.get_template(name)
+        assert tmpl.root_render_func.buffered is not None
+        assert tmpl.render(x=0) == "".join(tmpl.generate(x=0))
+
+    def test_include_in_macro(self):
+        env = Environment(loader=DictLoader(self.templates))
+        assert env.get_template("macro").render() == "(<[A]|B>[A]1<[A]|B>[A])"
+
+    def test_async_not_buffered(self):
+        env = Environment(enable_async=True)
+        tmpl = env.from_string("{% block a %}{{ 1 }}{% endblock %}")
+        assert not hasattr(tmpl.root_render_func, "buffered")
+        assert not hasattr(tmpl.blocks["a"], "buffered")
+        assert tmpl.render() == "1"
+
+    def test_without_buffered_function(self):
+        env = Environment(loader=DictLoader(self.templates))
+        parent = env.get_template("base")
+        del parent.root_render_func.buffered
+        del parent.blocks["a"].buffered
+        assert env.get_template("child").render() == "<[A]|B>[A]"
+
 
 class TestUndefined:
     def test_stopiteration_is_undefined(self):
@@ -397,6 +556,309 @@ class TestUndefined:
             Undefined(obj=42, name="upper")()
 
 
+class TestSharedCodeCache:
+    def test_code_shared(self):
+        loader = DictLoader({"a": "{{ greeting }} {{ name|upper }}"})
+        env1 = Environment(loader=loader, shared_code_cache=True)
+        env2 = Environment(loader=loader, shared_code_cache=True)
+        env1.globals["greeting"] = "Hello"
+        env2.globals["greeting"] = "Bye"
+        t1 = env1.get_template("a")
+        t2 = env2.get_template("a")
+        assert t1.root_render_func.__code__ is t2.root_render_func.__code__
+        assert t1.render(name="x") == "Hello X"
+        assert t2.render(name="x") == "Bye X"
+
+    def test_different_config_not_shared(self):
+        source = "{{ value }}"
+        env = Environment(shared_code_cache=True)
+        code = env.compile(source)
+        assert Environment(shared_code_cache=True).compile(source) is code
+        assert (
+            Environment(autoescape=True, shared_code_cache=True).compile(source)
+            is not code
+        )
+        assert (
+            Environment(shared_code_cache=True, trim_blocks=True).compile(source)
+            is not code
+        )
+        assert Environment().compile(source) is not code
+
+    def test_filters_and_policies_not_shared(self):
+        source = "{{ 'abc'|f }}"
+        env1 = Environment(shared_code_cache=True)
+        env2 = Environment(shared_code_cache=True)
+        env1.filters["f"] = lambda x: x.upper()
+        env2.filters["f"] = lambda x: x[::-1]
+        assert env1.from_string(source).render() == "ABC"
+        assert env2.from_string(source).render() == "cba"
+        env2.filters["f"] = env1.filters["f"]
+        env2.policies["truncate.leeway"] = 0
+        assert env1.compile(source) is not env2.compile(source)
+
+    def test_filter_keys_not_reused(self):
+        from jinja2.environment import _code_cache
+
+        env = Environment(shared_code_cache=True)
+        env.filters["f"] = lambda x: x
+        key = env._compile_fingerprint()
+        env.filters["f"] = lambda x: x
+        gc.collect()
+        assert env._compile_fingerprint() != key
+        env.compile("{{ 1|f }}")
+        ref = weakref.ref(env.filters.pop("f"))
+        gc.collect()
+        assert ref() is None
+        assert len(_code_cache)
+
+    def test_extension_config_not_shared(self):
+        source = "{% trans %}Hello {{ name }}{% endtrans %}"
+        env1 = Environment(extensions=["jinja2.ext.i18n"], shared_code_cache=True)
+        env2 = Environment(extensions=["jinja2.ext.i18n"], shared_code_cache=True)
+        env1.install_null_translations(newstyle=False)
+        env2.install_null_translations(newstyle=True)
+        assert env1.compile(source) is not env2.compile(source)
+        assert env1.from_string(source).render(name="a") == "Hello a"
+        assert env2.from_string(source).render(name="a") == "Hello a"
+
+    def test_extension_fingerprint(self):
+        from jinja2.ext import Extension
+
+        class ConfigExtension(Extension):
+            def __init__(self, environment):
+                super().__init__(environment)
+                self.upper = False
+
+        env1 = Environment(extensions=[ConfigExtension], shared_code_cache=True)
+        env2 = Environment(extensions=[ConfigExtension], shared_code_cache=True)
+        assert env1._compile_fingerprint() == env2._compile_fingerprint()
+        env2.extensions[ConfigExtension.identifier].upper = True
+        assert env1._compile_fingerprint() != env2._compile_fingerprint()
+
+    def test_overlay(self):
+        env = Environment()
+        overlay = env.overlay(shared_code_cache=True)
+        assert not env.shared_code_cache
+        assert overlay.shared_code_cache
+        assert overlay.compile("{{ 42 }}") is overlay.compile("{{ 42 }}")
+
+    def test_clear_caches(self):
+        from jinja2.environment import _code_cache
+        from jinja2.utils import clear_caches
+
+        Environment(shared_code_cache=True).compile("{{ 42 }}")
+        assert len(_code_cache)
+        clear_caches()
+        assert not len(_code_cache)
+
+
+class TestStringCache:
+    def test_from_string(self, env):
+        t1 = env.from_string("{{ foo }}", globals={"foo": 1})
+        t2 = env.from_string("{{ foo }}", globals={"foo": 2})
+        assert t1 is not t2
+        assert t1.root_render_func.__code__ is t2.root_render_func.__code__
+        assert t1.render() == "1"
+        assert t2.render() == "2"
+
+    def test_compile_expression(self, env):
+        e1 = env.compile_expression("foo + 1")
+        e2 = env.compile_expression("foo + 1", undefined_to_none=False)
+        assert e1._template.root_render_func is not e2._template.root_render_func
+        code = e1._template.root_render_func.__code__
+        assert code is e2._template.root_render_func.__code__
+        assert e1(foo=1) == 2
+        assert env.from_string("foo + 1").root_render_func.__code__ is not code
+
+    def test_respects_settings(self, env):
+        source = "{{ '<b>'|f }}"
+        env.filters["f"] = lambda x: x * 2
+        assert env.from_string(source).render() == "<b><b>"
+        env.autoescape = True
+        assert env.from_string(source).render() == "&lt;b&gt;&lt;b&gt;"
+        env.filters["f"] = lambda x: x
+        assert env.from_string(source).render() == "&lt;b&gt;"
+
+    def test_fingerprint_cached(self, env):
+        key = env._compile_fingerprint()
+        assert env._compile_fingerprint() == key
+        assert env._mappings_key() is env._mappings_key()
+
+        for change in (
+            lambda: env.filters.update(f=str),
+            lambda: env.tests.pop("odd"),
+            lambda: env.policies.setdefault("new", 1),
+            lambda: setattr(env, "filters", dict(env.filters, g=str)),
+        ):
+            change()
+            assert env._compile_fingerprint() != key
+            key = env._compile_fingerprint()
+
+    def test_disabled(self):
+        env = Environment(string_cache_size=0)
+        assert env.string_cache is None
+        t1 = env.from_string("{{ foo }}")
+        t2 = env.from_string("{{ foo }}")
+        assert t1.root_render_func.__code__ is not t2.root_render_func.__code__
+
+    def test_overlay(self, env):
+        env.from_string("{{ foo }}")
+        overlay = env.overlay()
+        assert overlay.string_cache is not env.string_cache
+        assert not overlay.string_cache
+        assert env.overlay(string_cache_size=0).string_cache is None
+
+
+class TestConstantGlobals:
+    def make_env(self, **templates):
+        env = Environment(loader=DictLoader(templates))
+        env.globals.update(site="Example", debug=False, items=[1])
+        env.policies["compiler.constant_globals"] = ("site", "debug", "items")
+        return env
+
+    def test_folded(self):
+        env = self.make_env()
+        source = "{{ site }}{% if debug %}{{ secret }}{% endif %}{{ items }}"
+        code = env.compile(source, raw=True)
+        assert "resolve('site')" not in code
+        # The branch is analyzed but not compiled.
+        assert "l_0_secret is missing" not in code
+        # Mutable values are resolved when rendering.
+        assert "resolve('items')" in code
+        assert env.from_string(source).render(site="other") == "Example[1]"
+
+    def test_assigned_in_template(self):
+        env = self.make_env()
+        tmpl = env.from_string("{% for site in ['a'] %}{{ site }}{% endfor %}")
+        assert tmpl.render() == "a"
+        tmpl = env.from_string("{{ site }}{% set site = 'b' %}{{ site }}")
+        assert tmpl.render(site="a") == "ab"
+
+    def test_not_optimized(self):
+        env = self.make_env()
+        env.optimized = False
+        assert env.from_string("{{ site }}").render(site="a") == "a"
+
+    def test_cache_keys(self):
+        env = self.make_env(a="{{ site }}")
+        env.shared_code_cache = True
+        assert env.get_template("a").render() == "Example"
+        assert env.from_string("{{ site }}").render() == "Example"
+        env.globals["site"] = "Changed"
+        assert env.get_template("a").render() == "Changed"
+        assert env.from_string("{{ site }}").render() == "Changed"
+        assert env.compile("{{ site }}") is not Environment(
+            shared_code_cache=True
+        ).compile("{{ site }}")
+
+
+class TestPrefetchTemplates:
+    templates = {
+        "page": "{% extends 'layout' %}{% block b %}{% include ['a', x] %}"
+        "{% endblock %}",
+        "layout": "{% import 'macros' as m %}[{% block b %}{% endblock %}]",
+        "macros": "{% macro m() %}{% endmacro %}",
+        "a": "A",
+    }
+
+    def make_env(self, prefetch_templates):
+        loaded = []
+
+        def load(name):
+            loaded.append((name, threading.current_thread().name))
+            return self.templates.get(name)
+
+        env = Environment(
+            loader=FunctionLoader(load), prefetch_templates=prefetch_templates
+        )
+        return env, loaded
+
+    def test_referenced_templates(self, env):
+        tmpl = env.from_string(self.templates["page"])
+        assert tmpl._referenced_templates == ("layout", "a")
+        assert env.from_string("{% include x %}")._referenced_templates == ()
+
+    def test_prefetch(self):
+        env, loaded = self.make_env(True)
+        tmpl = env.get_template("page")
+
+        for _ in range(500):
+            if len(loaded) == 4 and not env._prefetching.futures:
+                break
+
+            time.sleep(0.01)
+
+        assert not env._prefetching.futures
+        assert sorted(name for name, _ in loaded) == ["a", "layout", "macros", "page"]
+        assert all(
+            thread.startswith("jinja2-prefetch")
+            for name, thread in loaded
+            if name != "page"
+        )
+        assert tmpl.render() == "[A]"
+        assert len(loaded) == 4
+
+    def test_shutdown(self):
+        from jinja2.environment import _get_prefetch_executor
+        from jinja2.environment import _shutdown_prefetch_executor
+
+        executor = _get_prefetch_executor()
+        _shutdown_prefetch_executor()
+        assert executor._shutdown
+        env, loaded = self.make_env(True)
+        assert env.get_template("page").render() == "[A]"
+        assert _get_prefetch_executor() is not executor
+
+    def test_concurrent(self):
+        release = threading.Event()
+        loaded = []
+
+        def load(name):
+            if name != "page":
+                loaded.append(name)
+                release.wait(5)
+
+            return self.templates["page"]
+
+        env = Environment(loader=FunctionLoader(load))
+        tmpl = env.get_template("page")
+        env.prefetch_templates = True
+        barrier = threading.Barrier(8)
+
+        def prefetch():
+            barrier.wait()
+            env._prefetch_referenced(tmpl)
+
+        threads = [threading.Thread(target=prefetch) for _ in range(8)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        futures = list(env._prefetching.futures.values())
+        release.set()
+
+        for future in futures:
+            future.result()
+
+        assert sorted(loaded) == ["a", "layout"]
+
+    def test_pickle(self):
+        env = Environment(loader=DictLoader(self.templates), prefetch_templates=True)
+        env._prefetching.futures[("page",)] = Future()
+        env = pickle.loads(pickle.dumps(env))
+        assert not env._prefetching.futures
+        assert env._prefetching.lock.acquire(blocking=False)
+
+    def test_disabled(self):
+        env, loaded = self.make_env(False)
+        env.get_template("page")
+        assert loaded == [("page", threading.current_thread().name)]
+        assert not env._prefetching.futures
+
+
 class TestLowLevel:
     def test_custom_code_generator(self):
         class CustomCodeGenerator(CodeGenerator):
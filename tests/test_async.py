@@ -1,3 +1,7 @@
+import asyncio
+import gc
+import threading
+
 import pytest
 
 from jinja2 import ChainableUndefined
@@ -5,10 +9,13 @@ from jinja2 import DictLoader
 from jinja2 import Environment
 from jinja2 import Template
 from jinja2.async_utils import auto_aiter
+from jinja2.async_utils import get_thread_loop
+from jinja2.async_utils import iter_async
 from jinja2.exceptions import TemplateNotFound
 from jinja2.exceptions import TemplatesNotFound
 from jinja2.exceptions import UndefinedError
 from jinja2.nativetypes import NativeEnvironment
+from jinja2.runtime import flush_marker
 
 
 def test_basic_async(run_async_fn):
@@ -658,6 +665,371 @@ def test_getitem_after_call():
     assert out == "[3, 4]"
 
 
+def test_render_into_async(run_async_fn, test_env_async):
+    t = test_env_async.from_string(
+        '{% for i in [1, 2, 3] %}{{ i }}{% endfor %}{% include "header" %}'
+    )
+    out = []
+
+    async def func():
+        await t.render_into_async(out.append, buffer_size=2)
+
+    run_async_fn(func)
+    assert out[0] == "12"
+    assert "".join(out) == t.render()
+    out.clear()
+    t.render_into(out.append)
+    assert "".join(out) == t.render()
+
+
+class TestAutoAwait:
+    def test_sync_builtins_not_checked(self):
+        env = Environment(enable_async=True)
+        code = env.compile("{{ x|upper }}{{ x is odd }}", raw=True)
+        assert "_aw :=" not in code
+
+    def test_awaitable_results(self, run_async_fn):
+        async def value():
+            return "v"
+
+        env = Environment(enable_async=True)
+        env.filters["wrap"] = lambda x: value()
+        t = env.from_string(
+            "{{ f() }}{{ x|wrap }}{{ o.a }}{{ d['a'] }}{{ c|default('-') }}"
+        )
+
+        class Obj:
+            @property
+            def a(self):
+                return value()
+
+        async def func():
+            return await t.render_async(f=value, o=Obj(), d={"a": value()}, c=value())
+
+        assert run_async_fn(func) == "vvvvv"
+
+
+class TestConcurrentOutput:
+    @pytest.fixture
+    def env(self):
+        env = Environment(enable_async=True)
+        env.policies["compiler.concurrent_output"] = True
+        return env
+
+    def test_concurrent(self, env):
+        event = asyncio.Event()
+
+        async def a():
+            await asyncio.wait_for(event.wait(), 1)
+            return "a"
+
+        async def b():
+            event.set()
+            return "b"
+
+        t = env.from_string("{{ a() }}|{{ x }}|{{ b() }}{{ 1 }}")
+        assert asyncio.run(t.render_async(a=a, b=b, x="x")) == "a|x|b1"
+
+    def test_error_cancels(self, env):
+        log = []
+
+        async def a():
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                log.append("cancelled")
+                raise
+
+        async def b():
+            raise ValueError
+
+        t = env.from_string("{{ a() }}{{ b() }}")
+
+        with pytest.raises(ValueError):
+            asyncio.run(t.render_async(a=a, b=b))
+
+        assert log == ["cancelled"]
+
+    def test_sync_error_closes(self, env):
+        coros = []
+
+        def a():
+            async def inner():
+                return "a"
+
+            coros.append(inner())
+            return coros[-1]
+
+        def b():
+            raise ValueError
+
+        t = env.from_string("{{ a() }}{{ b() }}")
+
+        with pytest.raises(ValueError):
+            asyncio.run(t.render_async(a=a, b=b))
+
+        assert coros[0].cr_frame is None
+
+    def test_sequential_error_closes(self, env, run_async_fn):
+        coros = []
+
+        async def a():
+            raise ValueError
+
+        def b():
+            async def inner():
+                return "b"
+
+            coros.append(inner())
+            return coros[-1]
+
+        t = env.from_string("{{ a() }}{{ b() }}")
+
+        async def func():
+            return await t.render_async(a=a, b=b)
+
+        with pytest.raises(ValueError):
+            run_async_fn(func)
+
+        assert coros[0].cr_frame is None
+
+    def test_sequential_without_asyncio(self, env, run_async_fn):
+        async def a():
+            return "a"
+
+        t = env.from_string("{{ a() }}{{ f() }}")
+
+        async def func():
+            return await t.render_async(a=a, f=lambda: "f")
+
+        assert run_async_fn(func) == "af"
+
+    def test_policy_disabled(self):
+        env = Environment(enable_async=True)
+        assert "gather_awaitables(" not in env.compile("{{ a() }}{{ b() }}", raw=True)
+
+
+class TestThreadLoop:
+    def test_reused(self):
+        loops = []
+
+        async def record():
+            loops.append(asyncio.get_running_loop())
+            return ""
+
+        t = Template("{{ f() }}{{ f() }}", enable_async=True)
+        t.render(f=record)
+        t.render(f=record)
+        assert len(set(loops)) == 1
+        assert loops[0] is get_thread_loop()
+
+    def test_per_thread(self):
+        t = Template("{{ f() }}", enable_async=True)
+        loops = []
+
+        async def record():
+            loops.append(asyncio.get_running_loop())
+            return ""
+
+        thread = threading.Thread(target=t.render, kwargs={"f": record})
+        thread.start()
+        thread.join()
+        t.render(f=record)
+        assert loops[0] is not loops[1]
+        del thread
+        gc.collect()
+        assert loops[0].is_closed()
+
+    def test_tasks_cancelled(self):
+        log = []
+        tasks = []
+
+        async def wait():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                log.append("cancelled")
+                raise
+
+        async def start():
+            tasks.append(asyncio.get_running_loop().create_task(wait()))
+            return "a"
+
+        t = Template("{{ f() }}", enable_async=True)
+        assert t.render(f=start) == "a"
+        assert log == ["cancelled"]
+        assert tasks[0].cancelled()
+
+    def test_asyncgens_finalized(self):
+        log = []
+        gens = []
+
+        async def agen():
+            try:
+                yield "a"
+                yield "b"
+            finally:
+                await asyncio.sleep(0)
+                log.append("closed")
+
+        def f():
+            gens.append(agen())
+            return gens[-1]
+
+        t = Template("{{ f()|first }}", enable_async=True)
+        thread = threading.Thread(target=t.render, kwargs={"f": f})
+        thread.start()
+        thread.join()
+        assert log == []
+        # The generator that was left open is closed with the loop.
+        del thread
+        gc.collect()
+        assert log == ["closed"]
+
+    def test_running_loop(self):
+        t = Template("{{ 1 }}", enable_async=True)
+
+        async def func():
+            with pytest.raises(RuntimeError, match="event loop"):
+                t.render()
+
+        asyncio.run(func())
+
+    def test_render_while_generating(self):
+        t = Template("{% for i in range(3) %}{{ i }}{% endfor %}", enable_async=True)
+        gen = iter_async(t.generate_async(), batch_size=2)
+        assert next(gen) == "0"
+        assert t.render() == "012"
+        assert list(gen) == ["1", "2"]
+
+    def test_expression(self):
+        env = Environment(enable_async=True)
+        assert env.compile_expression("x + 1")(x=1) == 2
+
+    def test_native(self, async_native_env):
+        assert async_native_env.from_string("{{ x }}").render(x=[1]) == [1]
+
+
+class TestIterAsync:
+    def test_batches(self):
+        log = []
+
+        async def agen():
+            for i in range(5):
+                log.append(i)
+                yield i
+
+        it = iter_async(agen(), batch_size=2)
+        assert next(it) == 0
+        assert log == [0, 1]
+        assert list(it) == [1, 2, 3, 4]
+
+    def test_hand_over_when_waiting(self):
+        log = []
+
+        async def agen():
+            yield 1
+            log.append("sleep")
+            await asyncio.sleep(0.01)
+            log.append("woke")
+            yield 2
+
+        it = iter_async(agen())
+        assert next(it) == 1
+        assert log == ["sleep"]
+        assert list(it) == [2]
+
+    def test_close(self):
+        log = []
+
+        async def agen():
+            try:
+                yield 1
+                await asyncio.sleep(0.01)
+                yield 2
+            finally:
+                log.append("closed")
+
+        it = iter_async(agen())
+        assert next(it) == 1
+        it.close()
+        assert log == ["closed"]
+
+    def test_error(self):
+        async def agen():
+            yield 1
+            raise ValueError
+
+        it = iter_async(agen())
+        assert next(it) == 1
+
+        with pytest.raises(ValueError):
+            next(it)
+
+    def test_generate_flush(self):
+        log = []
+        env = Environment(extensions=["jinja2.ext.flush"], enable_async=True)
+        t = env.from_string("a{% flush %}{{ f() }}")
+        gen = t.generate(f=lambda: log.append(1) or "b")
+        assert next(gen) == "a"
+        assert next(gen) is flush_marker
+        assert log == []
+        assert list(gen) == ["b"]
+        assert log == [1]
+
+
+class TestAsyncTemplateStream:
+    class Writer:
+        def __init__(self, log):
+            self.log = log
+
+        def write(self, data):
+            self.log.append(data)
+
+        async def drain(self):
+            self.log.append("drain")
+
+    def test_buffering(self, run_async_fn):
+        t = Template("{% for i in range(5) %}{{ i }}{% endfor %}", enable_async=True)
+
+        async def func():
+            stream = t.stream_async()
+            stream.enable_buffering(2)
+            return [x async for x in stream]
+
+        assert run_async_fn(func) == ["01", "23", "4"]
+
+    def test_dump_backpressure(self, run_async_fn):
+        log = []
+        t = Template("{% for i in range(3) %}{{ f(i) }}{% endfor %}", enable_async=True)
+
+        async def func():
+            stream = t.stream_async(f=lambda i: log.append(i) or "\u2713")
+            stream.enable_buffering(2, chars=True)
+            await stream.dump(self.Writer(log), "utf-16")
+
+        run_async_fn(func)
+        assert log == [
+            0,
+            1,
+            "\u2713\u2713".encode("utf-16"),
+            "drain",
+            2,
+            "\u2713".encode("utf-16")[2:],
+            "drain",
+        ]
+
+    def test_dump_str(self, run_async_fn):
+        log = []
+        t = Template("{% for i in range(3) %}{{ i }}{% endfor %}", enable_async=True)
+
+        async def func():
+            await t.stream_async().dump(self.Writer(log), None)
+
+        run_async_fn(func)
+        assert log == ["012", "drain"]
+
+
 def test_basic_generate_async(run_async_fn):
     t = Template(
         "{% for item in [1, 2, 3] %}[{{ item }}]{% endfor %}", enable_async=True
@@ -5,6 +5,7 @@ from jinja2.bccache import Bucket
 from jinja2.bccache import FileSystemBytecodeCache
 from jinja2.bccache import MemcachedBytecodeCache
 from jinja2.exceptions import TemplateNotFound
+from jinja2.utils import _stable_repr
 
 
 @pytest.fixture
@@ -19,6 +20,55 @@ class TestByteCodeCache:
         assert tmpl.render().strip() == "BAR"
         pytest.raises(TemplateNotFound, env.get_template, "missing.html")
 
+    def test_from_string(self, env, tmp_path):
+        env.policies["bccache.from_string"] = True
+        assert env.from_string("{{ 1 + 1 }}").render() == "2"
+        assert env.compile_expression("2 * 3")() == 6
+        assert len(list(tmp_path.iterdir())) == 2
+
+        other = Environment(bytecode_cache=env.bytecode_cache)
+        other.policies["bccache.from_string"] = True
+        other.compile = None
+        assert other.from_string("{{ 1 + 1 }}").render() == "2"
+        assert other.compile_expression("2 * 3")() == 6
+
+    def test_constant_globals(self, env, tmp_path):
+        env.globals["value"] = "a"
+        env.policies["compiler.constant_globals"] = ("value",)
+        env.policies["bccache.from_string"] = True
+        assert env.from_string("{{ value }}").render() == "a"
+        env.globals["value"] = "b"
+        env.string_cache.clear()
+        # The constant values are part of the configuration in the key.
+        assert env.from_string("{{ value }}").render() == "b"
+        assert len(list(tmp_path.iterdir())) == 2
+
+    def test_from_string_config(self, env, tmp_path):
+        env.policies["bccache.from_string"] = True
+        other = Environment(bytecode_cache=env.bytecode_cache, autoescape=True)
+        other.policies["bccache.from_string"] = True
+        assert env.from_string("{{ '<' }}").render() == "<"
+        assert other.from_string("{{ '<' }}").render() == "&lt;"
+        assert len(list(tmp_path.iterdir())) == 2
+
+    def test_from_string_key_stable(self, env):
+        # Without lambdas or other objects that only exist in this
+        # process, the key can be used by other processes.
+        key = _stable_repr(
+            Environment(extensions=["jinja2.ext.i18n"])._compile_fingerprint()
+        )
+        assert "0x" not in key
+        assert key == _stable_repr(
+            Environment(extensions=["jinja2.ext.i18n"])._compile_fingerprint()
+        )
+        other = Environment()
+        other.filters["f"] = lambda x: x
+        assert "0x" in _stable_repr(other._compile_fingerprint())
+
+    def test_from_string_disabled(self, env, tmp_path):
+        env.from_string("{{ 1 + 1 }}")
+        assert not list(tmp_path.iterdir())
+
 
 class MockMemcached:
     class Error(Exception):
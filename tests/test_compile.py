@@ -3,7 +3,11 @@ import re
 
 import pytest
 
+from jinja2 import nodes
+from jinja2 import StrictUndefined
 from jinja2 import UndefinedError
+from jinja2.compiler import find_undeclared
+from jinja2.compiler import TemplateAnalysis
 from jinja2.environment import Environment
 from jinja2.loaders import DictLoader
 
@@ -17,7 +21,8 @@ def test_filters_deterministic(tmp_path):
     content = (tmp_path / name).read_text("utf8")
     expect = [f"filters['filter{i}']" for i in range(10)]
     found = re.findall(r"filters\['filter\d']", content)
-    assert found == expect
+    # once for the generator and once for the buffered render function
+    assert found == expect * 2
 
 
 def test_import_as_with_context_deterministic(tmp_path):
@@ -106,3 +111,135 @@ def test_undefined_import_curly_name():
     # that `{bad}` is being interpreted as an f-string. It must be escaped.
     with pytest.raises(UndefinedError):
         env.get_template("{bad}").render()
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "{{ self.x() }}{% block x %}{{ super() }}{% endblock %}",
+        "{% set loop = 1 %}{% for a in b %}{{ loop.index }}{% set loop = 2 %}"
+        "{% endfor %}",
+        "{% for a in b %}{% block c scoped %}{{ loop }}{% endblock %}{% endfor %}",
+        "{% for a in b %}{% for loop in c %}{% endfor %}{% endfor %}",
+        "{% macro m(varargs) %}{{ caller() }}{{ kwargs }}{% endmacro %}",
+        "{% call(x) m() %}{% set caller = 1 %}{{ caller }}{% endcall %}",
+        "{% extends 'a' %}{% from 'b' import c %}{% block d %}{% block e %}"
+        "{% endblock %}{% endblock %}",
+    ],
+)
+def test_template_analysis(env, source):
+    node = env.parse(source)
+    analysis = TemplateAnalysis(node)
+    assert analysis.has_extends == (node.find(nodes.Extends) is not None)
+    assert analysis.blocks == list(node.find_all(nodes.Block))
+    assert analysis.imports == list(node.find_all(nodes.ImportedName))
+    special = ("self", "super", "caller", "kwargs", "varargs", "loop")
+
+    for body in [node.body] + [
+        n.body for n in node.find_all(nodes.Stmt) if "body" in n.fields
+    ]:
+        assert analysis.find_undeclared(body, special) == find_undeclared(body, special)
+
+    for loop in node.find_all(nodes.For):
+        assert analysis.has_scoped_block(loop) == any(
+            block.scoped for block in loop.find_all(nodes.Block)
+        )
+        assert analysis.find_loop_assignment(loop) is next(
+            (
+                name
+                for name in loop.find_all(nodes.Name)
+                if name.ctx == "store" and name.name == "loop"
+            ),
+            None,
+        )
+
+
+@pytest.mark.parametrize(
+    ("source", "dead"),
+    [
+        ("{% if false %}dead{% endif %}", True),
+        ("{% if true %}a{% else %}dead{% endif %}", True),
+        ("{% if x %}a{% elif 0 %}dead{% elif 1 %}b{% else %}dead{% endif %}", True),
+        ("{{ x if true else 'dead' }}", True),
+        ("{{ 'dead' if not 1 else x }}", True),
+        ("{% set d = false %}{% if d %}{{ x.y.z }}dead{% endif %}", True),
+        ("{% set d = none %}{{ 'dead' if d else d }}", True),
+        ("{% for a in b %}{% set d = 0 %}{% if d %}dead{% endif %}{% endfor %}", True),
+        ("{% if x %}{% set d = 0 %}{% endif %}{% if d %}dead{% endif %}", False),
+        ("{% if d %}dead{% endif %}{% set d = false %}", False),
+        ("{% set d = false %}{% set d = true %}{% if d %}dead{% endif %}", False),
+        ("{% set l = [] %}{% do l.append(1) %}{% if l %}dead{% endif %}", False),
+        ("{% set d = 0 %}{% block b %}{% if d %}dead{% endif %}{% endblock %}", False),
+        (
+            "{% set d = 0 %}{% macro m(d) %}{% if d %}dead{% endif %}{% endmacro %}",
+            False,
+        ),
+        ("{% autoescape x %}{% if false %}dead{% endif %}{% endautoescape %}", False),
+        ("{{ 1 if 'a'.b else 'dead' }}", False),
+        ("{% if false %}{% block b %}dead{% endblock %}{% endif %}", False),
+    ],
+)
+def test_dead_branches(source, dead):
+    kwargs = dict(undefined=StrictUndefined, extensions=["jinja2.ext.do"])
+    env = Environment(**kwargs)
+    code = env.compile(source, raw=True)
+    assert ("dead" not in code) == dead
+
+    context = {"x": 1, "b": [1], "d": True}
+    expect = Environment(optimized=False, **kwargs).from_string(source)
+
+    try:
+        expect = expect.render(context)
+    except UndefinedError:
+        with pytest.raises(UndefinedError):
+            env.from_string(source).render(context)
+    else:
+        assert env.from_string(source).render(context) == expect
+
+
+def test_dead_branch_loop_context(env):
+    # Dead branches are still seen by the scoping analysis, so that
+    # optimizing doesn't change how names are resolved.
+    code = env.compile(
+        "{% set debug = false %}{% for a in b %}"
+        "{% if debug %}{{ loop.index }}{% endif %}{{ a }}"
+        "{% endfor %}",
+        raw=True,
+    )
+    assert "LoopContext(" in code
+    assert "l_1_loop.index" not in code
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "{% with %}{% with %}{{ x }}{% endwith %}{% set x = 1 %}{% endwith %}"
+        "{% if false %}{{ x }}{% endif %}",
+        "{% for a in b %}{{ x }}{% set x = a %}{% endfor %}"
+        "{% if 0 %}{% set x = 2 %}{% endif %}{{ x }}",
+        "{% set d = false %}{% macro m() %}{{ x }}{% if d %}{{ x }}{% endif %}"
+        "{% endmacro %}{% set x = 3 %}{{ m() }}",
+        "{% set d = 0 %}{% for x in b %}{% if d %}{{ loop.index }}{% endif %}"
+        "{{ x }}{% endfor %}{{ x }}",
+        "{% call(y) caller_m() %}{{ y }}{{ x if false else '' }}{% endcall %}"
+        "{% set x = 'c' %}",
+        "{% set ns = namespace(v=x) %}{% if true %}{% set ns.v = 1 %}{% endif %}"
+        "{% with x = 4 %}{{ x if debug else ns.v }}{% endwith %}{{ x }}",
+        "{% if debug %}{% set x = 5 %}{% else %}{{ x }}{% endif %}{{ x }}",
+    ],
+)
+def test_optimized_scoping(source):
+    def make_env(optimized):
+        env = Environment(optimized=optimized)
+        env.globals.update(x="G", b=[1, 2], debug=False)
+        env.globals["caller_m"] = lambda caller: caller("y")
+        env.policies["compiler.constant_globals"] = ("debug",)
+        return env
+
+    env = make_env(True)
+    tree = env.parse(source)
+    assert (
+        env.from_string(tree).render() == make_env(False).from_string(source).render()
+    )
+    # Compiling doesn't change the tree.
+    assert tree == env.parse(source)
@@ -1,3 +1,4 @@
+import asyncio
 import re
 from io import BytesIO
 
@@ -12,6 +13,7 @@ from jinja2.exceptions import TemplateAssertionError
 from jinja2.ext import Extension
 from jinja2.lexer import count_newlines
 from jinja2.lexer import Token
+from jinja2.runtime import flush_marker
 
 importable_object = 23
 
@@ -314,6 +316,97 @@ class TestExtensions:
             assert f"'{value}'" in out
 
 
+class TestFlush:
+    @pytest.fixture
+    def env(self):
+        return Environment(
+            extensions=["jinja2.ext.flush"],
+            loader=DictLoader(
+                {
+                    "base": "<head>{% flush %}</head>{% block body %}{% endblock %}",
+                    "child": "{% extends 'base' %}{% flush %}"
+                    "{% block body %}a{% flush %}b{% endblock %}",
+                    "inc": "a{% flush %}b",
+                }
+            ),
+        )
+
+    def test_generate(self, env):
+        tmpl = env.get_template("base")
+        assert list(tmpl.generate()) == ["<head>", flush_marker, "</head>"]
+        assert tmpl.render() == "<head></head>"
+
+    def test_buffered_stream(self, env):
+        stream = env.get_template("child").stream()
+        stream.enable_buffering(100, chars=True)
+        assert list(stream) == ["<head>", "</head>a", "b"]
+
+    def test_render_into(self, env):
+        out = []
+        env.get_template("child").render_into(out.append, buffer_size=100)
+        assert out == ["<head>", "</head>a", "b"]
+
+    @pytest.mark.parametrize(
+        "source",
+        [
+            "<{% include 'inc' %}>",
+            "<{% include 'inc' without context %}>",
+            "{% for x in [1] %}<{% include 'inc' without context %}>{% endfor %}",
+        ],
+    )
+    def test_render_into_include(self, env, source):
+        out = []
+        env.from_string(source).render_into(out.append, buffer_size=100)
+        assert out == ["<a", "b>"]
+
+    def test_render_into_extended(self, env):
+        tmpl = env.from_string("{% extends 'child' %}")
+        out = []
+        tmpl.render_into(out.append, buffer_size=100)
+        assert out == ["<head>", "</head>a", "b"]
+        # Without a buffered render function, the output is extended.
+        del tmpl.root_render_func.buffered
+        out.clear()
+        tmpl.render_into(out.append, buffer_size=100)
+        assert out == ["<head>", "</head>a", "b"]
+
+    def test_dump(self, env):
+        class File:
+            def __init__(self):
+                self.data = []
+
+            def write(self, data):
+                self.data.append(data)
+
+        f = File()
+        env.get_template("child").stream().dump(f, "utf-8")
+        assert f.data == [b"<head>", b"</head>a", b"b"]
+        f = File()
+        stream = env.get_template("child").stream()
+        stream.enable_buffering(100, chars=True)
+        stream.dump(f, "utf-8")
+        assert f.data == [b"<head>", b"</head>a", b"b"]
+
+    def test_in_macro(self, env):
+        tmpl = env.from_string(
+            "{% macro m() %}a{% flush %}b{% endmacro %}{{ m() }}"
+            "{% filter upper %}c{% flush %}d{% endfilter %}"
+        )
+        assert list(tmpl.generate()) == ["ab", "CD"]
+
+    def test_async(self):
+        env = Environment(extensions=["jinja2.ext.flush"], enable_async=True)
+        tmpl = env.from_string("a{% flush %}b")
+        assert list(tmpl.generate()) == ["a", flush_marker, "b"]
+
+        async def func():
+            stream = tmpl.stream_async()
+            stream.enable_buffering(100, chars=True)
+            return [x async for x in stream]
+
+        assert asyncio.run(func()) == ["a", "b"]
+
+
 class TestInternationalization:
     def test_trans(self):
         tmpl = i18n_env.get_template("child.html")
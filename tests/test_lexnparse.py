@@ -5,10 +5,12 @@ from jinja2 import nodes
 from jinja2 import Template
 from jinja2 import TemplateSyntaxError
 from jinja2 import UndefinedError
+from jinja2.incremental import IncrementalParser
 from jinja2.lexer import Token
 from jinja2.lexer import TOKEN_BLOCK_BEGIN
 from jinja2.lexer import TOKEN_BLOCK_END
 from jinja2.lexer import TOKEN_EOF
+from jinja2.lexer import TokenBuffer
 from jinja2.lexer import TokenStream
 
 
@@ -40,6 +42,48 @@ class TestTokenStream:
         ]
 
 
+class TestTokenBuffer:
+    @pytest.mark.parametrize(
+        "source",
+        [
+            "",
+            "text",
+            "a {{ b|c(1, 2.5, 'd\\n') }}\r\n{% for e in f -%}\n  {{ e }}{% endfor %}",
+            "{% raw %} {{ a }} {% endraw %}{# b #}{{ c }}\n",
+        ],
+    )
+    def test_tokens(self, env, source):
+        buffer = TokenBuffer(env.lexer, source)
+        tokens = list(env.lexer.tokenize(source))
+        assert list(buffer) == tokens
+        assert [buffer[i] for i in range(len(buffer))] == tokens
+
+    def test_converted_values(self):
+        env = Environment(newline_sequence="\r\n")
+        buffer = TokenBuffer(env.lexer, "a\nb{{ 'c' }}{{ 1_0 }}")
+        assert [token.value for token in buffer] == [
+            "a\r\nb",
+            "{{",
+            "c",
+            "}}",
+            "{{",
+            10,
+            "}}",
+        ]
+        assert buffer[-1] == Token(2, "variable_end", "}}")
+
+    def test_stream(self, env):
+        buffer = TokenBuffer(env.lexer, "{{ a }}", "name", "filename")
+        stream = buffer.stream()
+        assert stream.name == "name"
+        assert [token.type for token in stream] == [
+            "variable_begin",
+            "name",
+            "variable_end",
+        ]
+        assert stream.current.type is TOKEN_EOF
+
+
 class TestLexer:
     def test_raw1(self, env):
         tmpl = env.from_string(
@@ -132,6 +176,27 @@ class TestLexer:
                 result = tmpl.render()
                 assert result == expect, (keep, template, result, expect)
 
+    def test_trailing_newline_after_tag(self, env):
+        tokens = list(env.lex("a\r\n{{ b }}\r\n"))
+        assert tokens == [
+            (1, "data", "a\n"),
+            (2, "variable_begin", "{{"),
+            (2, "whitespace", " "),
+            (2, "name", "b"),
+            (2, "whitespace", " "),
+            (2, "variable_end", "}}"),
+        ]
+
+    @pytest.mark.parametrize("prefix", [None, "#"])
+    def test_large_data(self, prefix):
+        env = Environment(line_statement_prefix=prefix)
+        text = "text with { and % and #}\r\n" * 1000
+        tokens = list(env.lex(f"{text}{{{{ x }}}}{text}{{# c #}}"))
+        assert tokens[0] == (1, "data", text.replace("\r\n", "\n"))
+        assert tokens[1] == (1001, "variable_begin", "{{")
+        assert tokens[-4] == (1001, "data", text.replace("\r\n", "\n"))
+        assert tokens[-3] == (2001, "comment_begin", "{#")
+
     @pytest.mark.parametrize(
         ("name", "valid"),
         [
@@ -1027,3 +1092,84 @@ class TestTrimBlocks:
         assert tmpl.render() == "    \n\n    "
         tmpl = env.from_string("    <!-- comment +-->\n\n    ")
         assert tmpl.render() == "    \n\n    "
+
+
+class TestIncrementalParser:
+    @pytest.mark.parametrize(
+        ("source", "edit"),
+        [
+            ("{% if a %}a{% endif %}\n{{ b }}{% set c = 1 %}", (6, 7, "x")),
+            (
+                "{% if a %}a{% endif %}\n{{ b }}{% set c = 1 %}",
+                (10, 11, "{% if d %}d{% endif %}"),
+            ),
+            ("{% if a %}a{% endif %}\n{{ b }}", (22, 23, "")),
+            ("{% for a in b %}{{ a }}\n\n{% endfor %}{{ c }}", (16, 23, "{{ (d) }}")),
+            ("a\n{% raw %}{{ b }}{% endraw %}\n{% set c = 1 %}", (0, 1, "\n\n")),
+            ("{% set a = 1 %}{% set b = 2 %}", (15, 15, "\r\n")),
+        ],
+    )
+    def test_edit(self, env, source, edit):
+        parser = IncrementalParser(env, source)
+        parser.parse()
+        tree = parser.edit(*edit)
+        expect = env.parse(parser.source)
+        assert tree == expect
+        assert [n.lineno for n in tree.find_all(nodes.Node)] == [
+            n.lineno for n in expect.find_all(nodes.Node)
+        ]
+
+    @pytest.mark.parametrize(
+        "env_options",
+        [
+            {"trim_blocks": True},
+            {"lstrip_blocks": True},
+            {"line_statement_prefix": "#"},
+        ],
+    )
+    def test_whitespace_control(self, env_options):
+        env = Environment(**env_options)
+        source = "{% if a %}a{% endif %}  \n  {% set b = 1 %}\n# if c\nc\n# endif\n"
+        parser = IncrementalParser(env, source)
+        parser.parse()
+
+        for edit in [(22, 22, "\n"), (24, 24, " "), (22, 24, "")]:
+            assert parser.edit(*edit) == env.parse(parser.source)
+
+    @pytest.mark.parametrize(
+        "source", ["{% if x %}a{% endif %}\n", "{% set a = 1 %}{#b#}{% set c = 1 %}\n"]
+    )
+    def test_append_after_final_newline(self, source):
+        # The final newline isn't tokenized, but trim_blocks strips it
+        # once something is appended.
+        env = Environment(trim_blocks=True)
+        parser = IncrementalParser(env, source)
+        parser.parse()
+        assert parser.edit(len(source), len(source), "b") == env.parse(source + "b")
+
+    def test_reuse(self, env):
+        parser = IncrementalParser(
+            env, "{{ a }}{% set b = 1 %}\n{% if c %}c{% endif %}"
+        )
+        old = parser.parse()
+        tree = parser.edit(3, 4, "\nd\n")
+        assert tree.body[0] is not old.body[0]
+        assert tree.body[-1] is old.body[-1]
+        assert tree.body[-1].lineno == 4
+        assert tree.body[-1].test.lineno == 4
+
+    def test_syntax_error(self, env):
+        parser = IncrementalParser(env, "{{ a }}{% if b %}b{% endif %}")
+        old = parser.parse()
+
+        with pytest.raises(TemplateSyntaxError):
+            parser.edit(7, 17, "")
+
+        assert parser.tree is old
+        assert parser.edit(0, 0, "{% if b %}") == env.parse(parser.source)
+
+    def test_invalid_range(self, env):
+        parser = IncrementalParser(env, "abc")
+
+        with pytest.raises(ValueError):
+            parser.edit(2, 4, "")
@@ -3,10 +3,14 @@ import importlib.machinery
 import importlib.util
 import os
 import shutil
+import sqlite3
 import sys
 import tempfile
+import threading
 import time
 import weakref
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
 from pathlib import Path
 
 import pytest
@@ -198,6 +202,291 @@ class TestFileSystemLoader:
         assert ", 'other'" in e_str
 
 
+class TemplateServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), TemplateRequestHandler)
+        self.templates = {}
+        self.requests = []
+        self.connections = 0
+        self.delay = 0
+        self.etag_version = 0
+        self.drop = False
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/templates/"
+
+
+class TemplateRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        name = self.path.removeprefix("/templates/")
+        self.server.requests.append((name, self.headers.get("If-None-Match")))
+        time.sleep(self.server.delay)
+
+        if name not in self.server.templates:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = self.server.templates[name].encode("utf-8")
+        etag = f'"{hash(body)}-{self.server.etag_version}"'
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+        # Close the connection without telling the client.
+        self.close_connection = self.server.drop
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestHTTPLoader:
+    @pytest.fixture
+    def server(self):
+        server = TemplateServer()
+        thread = threading.Thread(
+            target=server.serve_forever, args=(0.05,), daemon=True
+        )
+        thread.start()
+        yield server
+        server.shutdown()
+        server.server_close()
+
+    @pytest.fixture
+    def loader(self, server):
+        loader = loaders.HTTPLoader(server.url)
+        yield loader
+        loader.close()
+
+    def test_load(self, server, loader):
+        server.templates["a.html"] = "{% include 'sub/b.html' %}"
+        server.templates["sub/b.html"] = "{{ 'ü' }}"
+        env = Environment(loader=loader)
+        assert env.get_template("a.html").render() == "ü"
+        pytest.raises(TemplateNotFound, env.get_template, "missing.html")
+        assert server.connections == 1
+
+    def test_invalid_url(self):
+        with pytest.raises(ValueError, match="Not an HTTP URL"):
+            loaders.HTTPLoader("ftp://example.com/templates/")
+
+    def test_conditional_uptodate(self, server, loader):
+        server.templates["a.html"] = "a"
+        env = Environment(loader=loader)
+        assert env.get_template("a.html").render() == "a"
+        assert env.get_template("a.html").render() == "a"
+        assert server.requests[-1][1] is not None
+
+        server.templates["a.html"] = "b"
+        assert env.get_template("a.html").render() == "b"
+        # The changed template was downloaded by the uptodate check.
+        assert len(server.requests) == 3
+
+        del server.templates["a.html"]
+        pytest.raises(TemplateNotFound, env.get_template, "a.html")
+
+    def test_new_validators(self, server, loader):
+        server.templates["a.html"] = "a"
+        env = Environment(loader=loader)
+        tmpl = env.get_template("a.html")
+        server.etag_version = 1
+        assert tmpl.is_up_to_date
+        assert tmpl.is_up_to_date
+        etag = server.requests[-1][1]
+        # The second check sends the new ETag and gets a 304.
+        assert etag is not None and etag.endswith('-1"')
+
+    def test_retry_closed_connection(self, server, loader):
+        server.templates["a.html"] = "a"
+        server.drop = True
+        env = Environment(loader=loader)
+        assert env.get_template("a.html").is_up_to_date
+        assert len(server.requests) == 2
+        assert server.connections == 2
+
+    def test_timeout_not_retried(self, server):
+        server.templates["a.html"] = "a"
+        loader = loaders.HTTPLoader(server.url, timeout=0.1)
+
+        try:
+            tmpl = Environment(loader=loader).get_template("a.html")
+            server.delay = 0.3
+
+            with pytest.raises(TimeoutError):
+                loader._fetch("a.html")
+
+            assert len(server.requests) == 2
+            # The uptodate check treats errors as up to date.
+            assert tmpl.is_up_to_date
+        finally:
+            loader.close()
+
+    def test_background_refresh(self, server):
+        server.templates["a.html"] = "a"
+        loader = loaders.HTTPLoader(server.url, refresh_interval=0.01)
+        env = Environment(loader=loader)
+
+        try:
+            tmpl = env.get_template("a.html")
+            assert env.get_template("a.html") is tmpl
+            server.templates["a.html"] = "b"
+
+            for _ in range(500):
+                if not tmpl.is_up_to_date:
+                    break
+
+                time.sleep(0.01)
+
+            assert env.get_template("a.html").render() == "b"
+        finally:
+            loader.close()
+
+    def test_close_waits_for_refresh(self, server):
+        server.templates["a.html"] = "a"
+        loader = loaders.HTTPLoader(server.url, refresh_interval=0.01)
+        Environment(loader=loader).get_template("a.html")
+        server.delay = 0.1
+
+        for _ in range(500):
+            if len(server.requests) > 1:
+                break
+
+            time.sleep(0.01)
+
+        loader.close()
+        # A refresh still in progress would return its connection now.
+        time.sleep(0.2)
+        empty = loader._pool.empty()
+        loader.close()
+        assert empty
+
+
+class TestSQLiteLoader:
+    @pytest.fixture
+    def connection(self):
+        conn = sqlite3.connect(":memory:")
+        conn.execute(
+            "CREATE TABLE templates (name TEXT PRIMARY KEY, source TEXT, version)"
+        )
+        conn.executemany(
+            "INSERT INTO templates VALUES (?, ?, 1)",
+            [
+                ("layout.html", "<{% block body %}{% endblock %}>"),
+                (
+                    "page.html",
+                    "{% extends 'layout.html' %}{% block body %}"
+                    "{% include 'part.html' %}{% endblock %}",
+                ),
+                ("part.html", "{% import 'macros.html' as m %}{{ m.x() }}"),
+                ("macros.html", "{% macro x() %}x{% endmacro %}"),
+            ],
+        )
+        yield conn
+        conn.close()
+
+    def test_load(self, connection):
+        env = Environment(loader=loaders.SQLiteLoader(connection))
+        assert env.get_template("page.html").render() == "<x>"
+        pytest.raises(TemplateNotFound, env.get_template, "missing.html")
+
+    def test_list_templates(self, connection):
+        loader = loaders.SQLiteLoader(connection)
+        assert loader.list_templates() == [
+            "layout.html",
+            "macros.html",
+            "page.html",
+            "part.html",
+        ]
+
+    def test_uptodate(self, connection):
+        env = Environment(loader=loaders.SQLiteLoader(connection))
+        tmpl = env.get_template("layout.html")
+        assert tmpl.is_up_to_date
+        connection.execute(
+            "UPDATE templates SET source = '[{% block body %}{% endblock %}]',"
+            " version = 2 WHERE name = 'layout.html'"
+        )
+        assert not tmpl.is_up_to_date
+        assert env.get_template("page.html").render() == "[x]"
+        tmpl = env.get_template("layout.html")
+        connection.execute("DELETE FROM templates WHERE name = 'layout.html'")
+        assert not tmpl.is_up_to_date
+
+    def test_prefetch_references(self, connection):
+        loader = loaders.SQLiteLoader(connection)
+        env = Environment(loader=loader)
+        loader.update_references(env)
+        assert connection.execute(
+            "SELECT * FROM template_references ORDER BY name"
+        ).fetchall() == [
+            ("page.html", "layout.html"),
+            ("page.html", "part.html"),
+            ("part.html", "macros.html"),
+        ]
+
+        queries = []
+        connection.set_trace_callback(queries.append)
+        assert env.get_template("page.html").render() == "<x>"
+        assert len([q for q in queries if "source" in q]) == 1
+
+    def test_prefetched_changed(self, connection):
+        loader = loaders.SQLiteLoader(connection)
+        env = Environment(loader=loader)
+        loader.update_references(env)
+        assert env.get_template("part.html").render() == "x"
+        # Fetches part.html and macros.html again, which are cached.
+        assert env.get_template("page.html").render() == "<x>"
+        connection.execute(
+            "UPDATE templates SET source = 'y', version = 2 WHERE name = 'part.html'"
+        )
+        assert env.get_template("page.html").render() == "<y>"
+
+    def test_prefetched_per_thread(self, connection):
+        loader = loaders.SQLiteLoader(connection)
+        env = Environment(loader=loader)
+        loader.update_references(env)
+        loader.get_source(env, "page.html")
+        result = []
+        thread = threading.Thread(
+            target=lambda: result.append(loader._local.__dict__.get("prefetched"))
+        )
+        thread.start()
+        thread.join()
+        assert result == [None]
+        assert "layout.html" in loader._local.prefetched[1]
+
+    def test_database_path(self, tmp_path, connection):
+        path = tmp_path / "templates.db"
+        connection.commit()
+        connection.execute(f"VACUUM INTO '{path}'")
+        loader = loaders.SQLiteLoader(path)
+
+        try:
+            env = Environment(loader=loader)
+            assert env.get_template("page.html").render() == "<x>"
+        finally:
+            loader.close()
+
+
 class TestModuleLoader:
     archive = None
     mod_env = None
@@ -1,3 +1,102 @@
+import pickle
+
+import pytest
+
+from jinja2 import nodes
+from jinja2.visitor import NodeTransformer
+from jinja2.visitor import NodeVisitor
+
+
 def test_template_hash(env):
     template = env.parse("hash test")
     hash(template)
+
+
+def test_slots():
+    node = nodes.Name("a", "load", lineno=1)
+    assert not hasattr(node, "__dict__")
+    assert nodes.Name.__slots__ == ("name", "ctx")
+
+    with pytest.raises(AttributeError):
+        node.unknown = 1
+
+
+@pytest.mark.parametrize("protocol", range(pickle.HIGHEST_PROTOCOL + 1))
+def test_pickle(env, protocol):
+    template = env.parse("{% for a, b in c %}{{ a ~ b }}{% endfor %}")
+    loaded = pickle.loads(pickle.dumps(template, protocol))
+    assert loaded == template
+    assert loaded.body[0].lineno == 1
+    assert loaded.body[0].target.set_ctx("load").ctx == "load"
+    assert env.from_string(loaded).render(c=[("a", 1)]) == "a1"
+
+
+class NameCollector(NodeVisitor):
+    def __init__(self):
+        self.names = []
+
+    def visit_Name(self, node):
+        self.names.append(node.name)
+
+
+def test_visitor_dispatch(env):
+    class ConstCollector(NameCollector):
+        def visit_Const(self, node):
+            self.names.append(node.value)
+
+    visitor = ConstCollector()
+    visitor.visit(env.parse("{{ a + 1 }}{% for b in c %}{{ 'd' }}{% endfor %}"))
+    assert visitor.names == ["a", 1, "b", "c", "d"]
+
+
+def test_visitor_staticmethod(env):
+    class StaticVisitor(NodeVisitor):
+        @staticmethod
+        def visit_Name(node):
+            return node.name
+
+    assert StaticVisitor().visit(nodes.Name("a", "load")) == "a"
+
+
+def test_visitor_get_visitor(env):
+    class UpperCollector(NameCollector):
+        def get_visitor(self, node):
+            if isinstance(node, nodes.Name):
+                return lambda node: self.names.append(node.name.upper())
+
+            return None
+
+    visitor = UpperCollector()
+    visitor.visit(env.parse("{{ a ~ b }}"))
+    assert visitor.names == ["A", "B"]
+
+
+def test_visitor_patched(env, monkeypatch):
+    # Visitor functions are looked up once per class and node type.
+    class Collector(NameCollector):
+        pass
+
+    template = env.parse("{{ a ~ 'b' }}")
+    visitor = Collector()
+    monkeypatch.setattr(
+        Collector,
+        "visit_Const",
+        lambda self, node: self.names.append(node.value),
+        raising=False,
+    )
+    visitor.visit(template)
+    assert visitor.names == ["a", "b"]
+    monkeypatch.setattr(Collector, "visit_Const", lambda self, node: None)
+    visitor.visit_Name = lambda node: visitor.names.append(node.name.upper())
+    visitor.visit(template)
+    assert visitor.names == ["a", "b", "a", "b"]
+
+
+def test_transformer(env):
+    class Renamer(NodeTransformer):
+        def visit_Name(self, node):
+            return nodes.Name(node.name * 2, node.ctx, lineno=node.lineno)
+
+    template = Renamer().visit(env.parse("{{ a }}{% set b = c %}"))
+    assert env.from_string(template).render(aa=1, cc=2) == "1"
+    assert template.body[1].target.name == "bb"